@@ -161,6 +161,28 @@ WSGI_APPLICATION = "core.wsgi.application"
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
 DATABASES = {"default": dj_database_url.config(default=os.environ.get("DATABASE_URL"))}
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Database cache needs `python manage.py createcachetable`. The generation
+# worker runs in its own process, so it needs a shared (file or database)
+# cache for its writes to invalidate the web process's entries.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "duty-planner"),
+    }
+}
+PLANNER_CACHE_ALIAS = os.getenv("PLANNER_CACHE_ALIAS", "default")
+PLANNER_CACHE_TIMEOUT = int(os.getenv("PLANNER_CACHE_TIMEOUT", "300"))
+# Running generation jobs older than this many seconds are failed as abandoned.
+PLANNER_JOB_TIMEOUT = int(os.getenv("PLANNER_JOB_TIMEOUT", "3600"))
+# Directory for JSON lines decision traces of traced plan runs, off when empty.
+PLANNER_TRACE_DIR = os.getenv("PLANNER_TRACE_DIR", "")
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
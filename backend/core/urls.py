@@ -26,6 +26,7 @@ from django.urls import include, path
 from planner.views import (
     DaysOffViewSet,
     DutyAssignmentViewSet,
+    GenerationJobViewSet,
     StaffViewSet,
 )
 from rest_framework.routers import DefaultRouter
@@ -34,6 +35,7 @@ router = DefaultRouter()
 router.register("users", StaffViewSet, basename="users")
 router.register("days-off", DaysOffViewSet, basename="days-off")
 router.register("duties", DutyAssignmentViewSet, basename="duty-assignments")
+router.register("generation-jobs", GenerationJobViewSet, basename="generation-jobs")
 
 urlpatterns = [
     path("admin/", admin.site.urls),
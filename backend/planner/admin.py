@@ -1,8 +1,39 @@
 from django.contrib import admin
 
-from .models import DaysOff, Duty, DutyAssignment, Staff
+from .models import (
+    DaysOff,
+    Duty,
+    DutyAssignment,
+    GenerationJob,
+    Staff,
+    StaffMonthStats,
+)
+from .services.assignments import CachedManageAssignments
+
+
+@admin.register(DutyAssignment)
+class DutyAssignmentAdmin(admin.ModelAdmin):
+    def delete_queryset(self, request, queryset):
+        # QuerySet.delete() skips DutyAssignment.delete(), which keeps
+        # StaffMonthStats in sync.
+        for assignment in queryset.select_related("duty"):
+            assignment.delete()
+
+
+@admin.register(Duty)
+class DutyAdmin(admin.ModelAdmin):
+    # Cascaded assignments are deleted by the service, which subtracts them
+    # from StaffMonthStats.
+    def delete_model(self, request, obj):
+        CachedManageAssignments().delete_duties_by_id([obj.id])
+
+    def delete_queryset(self, request, queryset):
+        CachedManageAssignments().delete_duties_by_id(
+            list(queryset.values_list("id", flat=True))
+        )
+
 
-admin.site.register(DutyAssignment)
 admin.site.register(Staff)
-admin.site.register(Duty)
 admin.site.register(DaysOff)
+admin.site.register(StaffMonthStats)
+admin.site.register(GenerationJob)
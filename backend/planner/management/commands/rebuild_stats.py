@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from planner.services.assignments import ManageAssignments
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-user monthly duty counters from assignments"
+
+    def handle(self, *args, **options):
+        count = ManageAssignments().rebuild_stats()
+        self.stdout.write(f"Rebuilt {count} monthly counters")
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from planner.services.jobs import GenerationJobs
+
+
+class Command(BaseCommand):
+    help = "Run pending plan generation jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the pending jobs and exit instead of polling",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between polls when there are no jobs",
+        )
+
+    def handle(self, *args, **options):
+        jobs = GenerationJobs()
+        while True:
+            processed = jobs.run_pending()
+            if processed:
+                self.stdout.write(f"Processed {processed} generation jobs")
+            if options["once"]:
+                return
+            if not processed:
+                time.sleep(options["interval"])
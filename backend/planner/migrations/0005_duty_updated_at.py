@@ -0,0 +1,22 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0004_staff_priority_gte_0"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="duty",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
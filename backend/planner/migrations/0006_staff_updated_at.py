@@ -0,0 +1,22 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0005_duty_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="staff",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+
+def fill_stats(apps, schema_editor):
+    DutyAssignment = apps.get_model("planner", "DutyAssignment")
+    StaffMonthStats = apps.get_model("planner", "StaffMonthStats")
+    rows = (
+        DutyAssignment.objects.annotate(month=TruncMonth("duty__date"))
+        .values("user_id", "month")
+        .annotate(duty_count=Count("id"))
+        .order_by()
+    )
+    StaffMonthStats.objects.bulk_create(StaffMonthStats(**row) for row in rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0006_staff_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StaffMonthStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField()),
+                ("duty_count", models.PositiveIntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="planner.staff",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("month", "user"), name="unique_staff_month_stats"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
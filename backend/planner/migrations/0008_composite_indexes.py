@@ -0,0 +1,55 @@
+# Generated by Django 6.0.2 on 2026-10-18 01:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0007_staffmonthstats"),
+    ]
+
+    # The composite indexes are created before the single-column ones they
+    # replace are dropped.
+    operations = [
+        migrations.AddIndex(
+            model_name="daysoff",
+            index=models.Index(fields=["date", "user"], name="daysoff_date_user_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="dutyassignment",
+            index=models.Index(
+                fields=["duty", "user"],
+                include=("id",),
+                name="assignment_duty_user_idx",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="daysoff",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="planner.staff",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="dutyassignment",
+            name="duty",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="planner.duty",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="dutyassignment",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="planner.staff",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0009_generationjob"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="daysoff",
+            name="date",
+            field=models.DateField(),
+        ),
+    ]
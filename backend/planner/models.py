@@ -1,6 +1,16 @@
+import datetime
+import operator
+from collections import Counter
+from functools import reduce
+
 from bulk_update_or_create import BulkUpdateOrCreateQuerySet
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest
+
+
+def month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
 
 
 class Staff(models.Model):
@@ -8,6 +18,7 @@ class Staff(models.Model):
     last_name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     priority = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         constraints = [
@@ -23,13 +34,16 @@ class Staff(models.Model):
 
 
 class DaysOff(models.Model):
-    user = models.ForeignKey(Staff, on_delete=models.CASCADE)
-    date = models.DateField(db_index=True)
+    # user lookups are served by unique_day_off; daysoff_date_user_idx covers
+    # date lookups and the (user, date) pairs read for a date range
+    user = models.ForeignKey(Staff, on_delete=models.CASCADE, db_index=False)
+    date = models.DateField()
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=["user", "date"], name="unique_day_off")
         ]
+        indexes = [models.Index(fields=["date", "user"], name="daysoff_date_user_idx")]
 
     def __str__(self):
         return f"{self.date} - userid: {self.user.id}"
@@ -37,6 +51,7 @@ class DaysOff(models.Model):
 
 class Duty(models.Model):
     date = models.DateField(db_index=True, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     objects = BulkUpdateOrCreateQuerySet.as_manager()
 
@@ -45,8 +60,10 @@ class Duty(models.Model):
 
 
 class DutyAssignment(models.Model):
-    user = models.ForeignKey(Staff, on_delete=models.CASCADE)
-    duty = models.ForeignKey(Duty, on_delete=models.CASCADE)
+    # user lookups are served by unique_user_duty, duty lookups by
+    # assignment_duty_user_idx which also covers the prefetch columns
+    user = models.ForeignKey(Staff, on_delete=models.CASCADE, db_index=False)
+    duty = models.ForeignKey(Duty, on_delete=models.CASCADE, db_index=False)
 
     objects = BulkUpdateOrCreateQuerySet.as_manager()
 
@@ -54,3 +71,120 @@ class DutyAssignment(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["user", "duty"], name="unique_user_duty")
         ]
+        indexes = [
+            models.Index(
+                fields=["duty", "user"],
+                include=["id"],
+                name="assignment_duty_user_idx",
+            )
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            counts: Counter = Counter()
+            if self.pk is not None:
+                previous = (
+                    DutyAssignment.objects.filter(pk=self.pk)
+                    .values_list("user_id", "duty__date")
+                    .first()
+                )
+                if previous is not None:
+                    counts[(previous[0], month_start(previous[1]))] -= 1
+            super().save(*args, **kwargs)
+            counts[(self.user_id, month_start(self.duty.date))] += 1
+            StaffMonthStats.objects.add(counts)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            result = super().delete(*args, **kwargs)
+            StaffMonthStats.objects.add(
+                {(self.user_id, month_start(self.duty.date)): -1}
+            )
+        return result
+
+
+class StaffMonthStatsQuerySet(models.QuerySet):
+    def add(self, counts: dict[tuple[int, datetime.date], int]) -> None:
+        """Adds ``counts`` keyed by ``(user_id, month)`` to the counters.
+
+        Missing rows are inserted with zero first, then every counter is
+        incremented in the database by one UPDATE, so concurrent writers
+        adding to the same (user, month) never overwrite each other.
+        """
+        counts = {key: diff for key, diff in counts.items() if diff}
+        if not counts:
+            return
+        with transaction.atomic(savepoint=False):
+            self.bulk_create(
+                [
+                    StaffMonthStats(user_id=user_id, month=month, duty_count=0)
+                    for user_id, month in counts
+                ],
+                ignore_conflicts=True,
+            )
+            keys = [Q(user_id=user_id, month=month) for user_id, month in counts]
+            self.filter(reduce(operator.or_, keys)).update(
+                duty_count=Greatest(
+                    F("duty_count")
+                    + Case(
+                        *[
+                            When(key, then=Value(diff))
+                            for key, diff in zip(keys, counts.values())
+                        ],
+                        default=Value(0),
+                    ),
+                    Value(0),
+                )
+            )
+
+
+class StaffMonthStats(models.Model):
+    """Number of duties of a staff member per month, kept by assignment writes"""
+
+    user = models.ForeignKey(Staff, on_delete=models.CASCADE)
+    month = models.DateField()
+    duty_count = models.PositiveIntegerField(default=0)
+
+    objects = StaffMonthStatsQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["month", "user"], name="unique_staff_month_stats"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} - userid: {self.user_id}: {self.duty_count}"
+
+
+class GenerationJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    params = models.JSONField()
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                condition=Q(status="pending"),
+                name="generationjob_pending_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.id}: {self.status}"
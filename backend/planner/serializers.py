@@ -1,8 +1,13 @@
+import csv
+import io
+
+from planner.services.planner import MAX_SEED
+from planner.services.solvers import DEFAULT_SOLVER, SOLVERS, GreedyHeapSolver
 from planner.validators import validate_date_not_past
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
-from .models import DaysOff, Duty, DutyAssignment, Staff
+from .models import DaysOff, Duty, DutyAssignment, GenerationJob, Staff
 
 
 class StaffSerializer(serializers.ModelSerializer):
@@ -13,6 +18,12 @@ class StaffSerializer(serializers.ModelSerializer):
         fields = ("id", "email", "last_name", "first_name", "full_name")
 
 
+class StaffPrioritySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Staff
+        fields = ("id", "priority")
+
+
 class MonthlyDutyCountSerializer(serializers.Serializer):
     month = serializers.IntegerField()
     duty_count = serializers.IntegerField()
@@ -65,6 +76,81 @@ class DaysOffBulkSerializer(serializers.Serializer):
         return data
 
 
+class DaysOffImportEntrySerializer(serializers.Serializer):
+    user = serializers.IntegerField(min_value=1)
+    dates = serializers.ListField(
+        child=serializers.DateField(validators=[validate_date_not_past]),
+        allow_empty=False,
+    )
+
+
+class DaysOffImportSerializer(serializers.Serializer):
+    """Days off of many staff members, as JSON entries or a CSV file.
+
+    The CSV file has a header row with ``user`` and ``date`` columns and one
+    day off per row. Staff ids and already existing days off are checked with
+    one query each; existing days off are rejected unless ``skip_existing``.
+    """
+
+    entries = DaysOffImportEntrySerializer(many=True, required=False)
+    file = serializers.FileField(required=False)
+    skip_existing = serializers.BooleanField(default=False)
+
+    def validate_file(self, file):
+        reader = csv.DictReader(io.TextIOWrapper(file, encoding="utf-8-sig"))
+        if not {"user", "date"} <= set(reader.fieldnames or []):
+            raise serializers.ValidationError(
+                "Файл должен содержать столбцы user и date."
+            )
+        dates_by_user: dict[str, list[str]] = {}
+        for row in reader:
+            dates_by_user.setdefault(row["user"], []).append(row["date"])
+        entries = DaysOffImportEntrySerializer(
+            data=[
+                {"user": user, "dates": dates} for user, dates in dates_by_user.items()
+            ],
+            many=True,
+        )
+        entries.is_valid(raise_exception=True)
+        return entries.validated_data
+
+    def validate(self, data):
+        entries = data.pop("file", None) or data.get("entries")
+        if not entries:
+            raise serializers.ValidationError("Передайте записи или CSV-файл.")
+
+        pairs = [(entry["user"], date) for entry in entries for date in entry["dates"]]
+        if len(pairs) != len(set(pairs)):
+            raise serializers.ValidationError("В запросе есть повторяющиеся даты.")
+
+        user_ids = {user_id for user_id, _ in pairs}
+        missing = user_ids - set(
+            Staff.objects.filter(id__in=user_ids).values_list("id", flat=True)
+        )
+        if missing:
+            raise serializers.ValidationError(
+                f"Сотрудники не найдены: {', '.join(map(str, sorted(missing)))}"
+            )
+
+        existing = set(pairs) & set(
+            DaysOff.objects.filter(
+                user_id__in=user_ids, date__in={date for _, date in pairs}
+            ).values_list("user_id", "date")
+        )
+        if existing and not data["skip_existing"]:
+            raise serializers.ValidationError(
+                "Уже есть выходные: "
+                + ", ".join(
+                    f"{user_id} {date.isoformat()}"
+                    for user_id, date in sorted(existing)
+                )
+            )
+
+        data["pairs"] = [pair for pair in pairs if pair not in existing]
+        data["skipped"] = len(existing)
+        return data
+
+
 class DutyAssignmentSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -77,9 +163,66 @@ class DatesQuerySerializer(serializers.Serializer):
     end_date = serializers.DateField(required=True)
 
 
-class DutyAssignmentGenerateSerializer(serializers.Serializer):
-    dates = serializers.ListField(child=serializers.DateField(), allow_empty=False)
+class CompactQuerySerializer(serializers.Serializer):
+    compact = serializers.BooleanField(default=False)
+
+
+class DutiesQuerySerializer(DatesQuerySerializer, CompactQuerySerializer):
+    pass
+
+
+class GenerateQuerySerializer(CompactQuerySerializer):
+    trace = serializers.BooleanField(default=False)
+
+
+class AssignQuerySerializer(CompactQuerySerializer):
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    delta = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if not data["delta"] and not ("start_date" in data and "end_date" in data):
+            raise serializers.ValidationError(
+                "Нужно указать start_date и end_date или delta=true"
+            )
+        return data
+
+
+class ListAssignmentsQuerySerializer(DutiesQuerySerializer):
+    cursor = serializers.DateField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, required=False)
+    stream = serializers.BooleanField(default=False)
+
+
+class PlanOptionsSerializer(serializers.Serializer):
     people_per_day = serializers.IntegerField(max_value=10, min_value=1)
+    solver = serializers.ChoiceField(
+        choices=list(SOLVERS), default=DEFAULT_SOLVER, required=False
+    )
+    seed = serializers.IntegerField(
+        min_value=0, max_value=MAX_SEED, required=False, allow_null=True
+    )
+
+
+class DutyAssignmentGenerateSerializer(PlanOptionsSerializer):
+    dates = serializers.ListField(child=serializers.DateField(), allow_empty=False)
+    replan = serializers.BooleanField(default=False)
+    background = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if data["replan"] and data["solver"] != GreedyHeapSolver.name:
+            raise serializers.ValidationError(
+                "Перепланирование поддерживает только solver=greedy"
+            )
+        return data
+
+
+class DutyAssignmentBatchGenerateSerializer(PlanOptionsSerializer):
+    ranges = serializers.ListField(
+        child=serializers.ListField(child=serializers.DateField(), allow_empty=False),
+        allow_empty=False,
+        max_length=24,
+    )
 
 
 class DutyAssignmentChangeSerializer(serializers.Serializer):
@@ -101,9 +244,77 @@ class DutyWithAssignmentsSerializer(serializers.ModelSerializer):
         return StaffSerializer(users, many=True).data
 
 
+class CompactDutySerializer(serializers.ModelSerializer):
+    users = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Duty
+        fields = ("id", "date", "users")
+
+    def get_users(self, obj: Duty) -> list[int]:
+        return [a.user_id for a in obj.dutyassignment_set.all()]
+
+
+def serialize_duties(duties, compact: bool = False) -> dict:
+    """Builds the ``data`` payload of duties, in compact form on request.
+
+    The compact form lists user ids per duty and serializes each assigned
+    person once in a top-level ``staff`` mapping keyed by id.
+    """
+    if not compact:
+        return {"data": DutyWithAssignmentsSerializer(duties, many=True).data}
+    staff = {
+        a.user_id: a.user for duty in duties for a in duty.dutyassignment_set.all()
+    }
+    return {
+        "data": CompactDutySerializer(duties, many=True).data,
+        "staff": {
+            user["id"]: user for user in StaffSerializer(staff.values(), many=True).data
+        },
+    }
+
+
 class DutyIdsSerializer(serializers.ModelSerializer):
     duty_ids = serializers.ListField(child=serializers.IntegerField())
 
     class Meta:
         model = Duty
         fields = ("id", "duty_ids")
+
+
+class DutyBulkDeleteSerializer(serializers.Serializer):
+    duty_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        has_range = "start_date" in data and "end_date" in data
+        has_dates = "start_date" in data or "end_date" in data
+        if ("duty_ids" in data) == has_dates or has_dates != has_range:
+            raise serializers.ValidationError(
+                "Нужно указать duty_ids или start_date и end_date"
+            )
+        if has_range and data["start_date"] > data["end_date"]:
+            raise serializers.ValidationError("start_date не может быть позже end_date")
+        return data
+
+
+class GenerationJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = GenerationJob
+        fields = (
+            "id",
+            "status",
+            "progress",
+            "errors",
+            "error",
+            "params",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
+
+    def get_progress(self, obj: GenerationJob) -> dict:
+        return {"done": obj.progress_done, "total": obj.progress_total}
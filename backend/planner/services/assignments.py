@@ -1,20 +1,41 @@
 import datetime
+import hashlib
 import itertools
 import logging
+import random
+from collections.abc import Callable, Iterable, Iterator
 
 from django.db import transaction
 from django.db.models import QuerySet
+from django.utils import timezone
 from planner.models import DaysOff, Duty, DutyAssignment, Staff
-from planner.services.planner import Planner
+from planner.services.cache import (
+    STAFF_SCOPE,
+    ScheduleCache,
+    month_scopes,
+    user_scope,
+)
+from planner.services.planner import Planner, new_seed
 from planner.services.repositories.days_off_repository import DaysOffRepository
 from planner.services.repositories.duty_assignment_repository import (
     DutyAssignmentRepository,
 )
 from planner.services.repositories.duty_repository import DutyRepository
+from planner.services.repositories.staff_month_stats_repository import (
+    StaffMonthStatsRepository,
+    full_months,
+)
 from planner.services.repositories.staff_repository import StaffRepository
+from planner.services.solvers import DEFAULT_SOLVER
+from planner.services.tracing import PlanTrace
+from planner.streaming import stream_assignments_ics
 
 logger = logging.getLogger(__name__)
 
+STREAM_CHUNK_SIZE = 200
+# Personal calendar feeds start this many days before today.
+CALENDAR_PAST_DAYS = 90
+
 
 class ManageAssignments:
     def __init__(self):
@@ -22,8 +43,18 @@ class ManageAssignments:
         self.duty_assignment_repo = DutyAssignmentRepository()
         self.staff_repo = StaffRepository()
         self.days_off_repo = DaysOffRepository()
+        self.stats_repo = StaffMonthStatsRepository()
 
-    def create_plan(self, start_date, end_date, people_per_day) -> dict:
+    def create_plan(
+        self,
+        start_date,
+        end_date,
+        people_per_day,
+        solver: str = DEFAULT_SOLVER,
+        seed: int | random.Random | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        trace: PlanTrace | None = None,
+    ) -> dict:
         plan = Planner(
             start_date,
             end_date,
@@ -32,9 +63,101 @@ class ManageAssignments:
             staff_repo=self.staff_repo,
             days_off_repo=self.days_off_repo,
             duty_assignment_repo=self.duty_assignment_repo,
+            stats_repo=self.stats_repo,
+            solver=solver,
+            seed=seed,
+            progress=progress,
+            trace=trace,
         )
         errors = plan.create_plan()
         plan.set_minimum_priority()
+        plan.trace.save()
+        self.on_assignments_changed(plan.changed_users)
+        return errors
+
+    def create_plans(
+        self,
+        date_sets: list[list[datetime.date]],
+        people_per_day,
+        solver: str = DEFAULT_SOLVER,
+        seed: int | random.Random | None = None,
+    ) -> dict:
+        """Plans several date sets in chronological order in one transaction.
+
+        Staff are read and shuffled once and the priorities reached by each
+        range are carried into the next one in memory; the changed ones are
+        saved and normalized once at the end. Every range draws from one
+        generator, so the batch seed is logged here rather than per range.
+        """
+        if isinstance(seed, random.Random):
+            rng, batch_seed = seed, None
+        else:
+            batch_seed = new_seed() if seed is None else seed
+            rng = random.Random(batch_seed)
+        logger.info("plan %s date sets, seed %s", len(date_sets), batch_seed)
+        trace = PlanTrace()
+        trace.record("plans", ranges=len(date_sets), seed=batch_seed)
+        errors: dict = {}
+        changed_users: set[int] = set()
+        with transaction.atomic():
+            ranges = sorted(
+                self.get_date_range(self.create_duty_days(dates)) for dates in date_sets
+            )
+            users = [(user.priority, user.id) for user in self.staff_repo.get_all()]
+            rng.shuffle(users)
+            stored = {user_id: priority for priority, user_id in users}
+            plan = None
+            for start_date, end_date in ranges:
+                plan = Planner(
+                    start_date,
+                    end_date,
+                    people_per_day,
+                    duty_repo=self.duty_repo,
+                    staff_repo=self.staff_repo,
+                    days_off_repo=self.days_off_repo,
+                    duty_assignment_repo=self.duty_assignment_repo,
+                    stats_repo=self.stats_repo,
+                    solver=solver,
+                    seed=rng,
+                    trace=trace,
+                )
+                errors.update(plan.create_plan(users=users, save_priorities=False))
+                changed_users.update(plan.changed_users)
+                users = [
+                    (priority, user_id) for user_id, priority in plan.priorities.items()
+                ]
+            if plan is not None:
+                plan.save_changed_priorities(plan.priorities, stored)
+                plan.set_minimum_priority()
+        trace.save()
+        self.on_assignments_changed(changed_users)
+        return errors
+
+    def replan(
+        self,
+        start_date,
+        end_date,
+        people_per_day,
+        seed: int | random.Random | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        trace: PlanTrace | None = None,
+    ) -> dict:
+        plan = Planner(
+            start_date,
+            end_date,
+            people_per_day,
+            duty_repo=self.duty_repo,
+            staff_repo=self.staff_repo,
+            days_off_repo=self.days_off_repo,
+            duty_assignment_repo=self.duty_assignment_repo,
+            stats_repo=self.stats_repo,
+            seed=seed,
+            progress=progress,
+            trace=trace,
+        )
+        errors = plan.replan()
+        plan.trace.save()
+        self.on_assignments_changed(plan.changed_users)
         return errors
 
     def _resolve_date_range(
@@ -48,9 +171,51 @@ class ManageAssignments:
         start_date, end_date = self._resolve_date_range(start_date, end_date)
         return self.duty_repo.get_list_of_duties(start_date, end_date)
 
+    def get_duties_page(
+        self,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        limit: int,
+        cursor: datetime.date | None = None,
+    ) -> tuple[list[Duty], datetime.date | None]:
+        duties = list(
+            self.duty_repo.get_list_of_duties_after(start_date, end_date, cursor)[
+                : limit + 1
+            ]
+        )
+        next_cursor = duties[limit - 1].date if len(duties) > limit else None
+        return duties[:limit], next_cursor
+
+    def iter_duties_by_date(
+        self,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[Duty]:
+        return self.duty_repo.get_list_of_duties(
+            start_date, end_date, ordered=True
+        ).iterator(chunk_size=chunk_size)
+
+    def iter_duty_assignments(
+        self,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[DutyAssignment]:
+        return (
+            self.duty_assignment_repo.get_list_of_duty_assignment(start_date, end_date)
+            .order_by("duty__date", "user_id")
+            .iterator(chunk_size=chunk_size)
+        )
+
     def create_duty_days(self, dates: list[datetime.date]) -> list[datetime.date]:
-        sorted_dates = sorted(dates)
-        return self.duty_repo.save_duty_days(sorted_dates)
+        self.upsert_duty_days(dates)
+        return sorted(set(dates))
+
+    def upsert_duty_days(self, dates: list[datetime.date]) -> dict:
+        """Creates the missing duty days, reporting created and existing dates."""
+        created, existing = self.duty_repo.upsert_duty_days(dates)
+        return {"created": created, "existing": existing}
 
     def get_duty_assignments(
         self, start_date: datetime.date, end_date: datetime.date | None = None
@@ -80,6 +245,11 @@ class ManageAssignments:
     ) -> list[DaysOff]:
         return self.days_off_repo.bulk_create(user_id, dates)
 
+    def import_days_off(self, pairs: list[tuple[int, datetime.date]]) -> None:
+        """Inserts ``(user_id, date)`` days off, skipping existing ones."""
+        with transaction.atomic():
+            self.days_off_repo.bulk_create_pairs(pairs)
+
     def get_all_staff(self) -> QuerySet[Staff]:
         return self.staff_repo.get_all()
 
@@ -97,7 +267,9 @@ class ManageAssignments:
             duty_assignment = self.duty_assignment_repo.create(
                 duty=duty, user_id=user_id
             )
+            self.duty_repo.touch([duty.id])
             self.staff_repo.update_priority(user_id, diff=1)
+        self.on_assignments_changed([user_id])
         return duty_assignment
 
     def update_assignment(
@@ -109,8 +281,10 @@ class ManageAssignments:
                 duty.id, prev_user_id
             )
             self.duty_assignment_repo.update(duty_assignment.id, user_id=new_user_id)
+            self.duty_repo.touch([duty.id])
             self.staff_repo.update_priority(new_user_id, diff=1)
             self.staff_repo.update_priority(prev_user_id, diff=-1)
+        self.on_assignments_changed([prev_user_id, new_user_id])
         return duty_assignment
 
     def delete_assignment(self, duty_date: datetime.date, user_id: int) -> None:
@@ -119,6 +293,8 @@ class ManageAssignments:
                 duty_date, user_id
             )
             self.duty_assignment_repo.delete(duty_assignment.id)
+            self.duty_repo.touch([duty_assignment.duty_id])
+        self.on_assignments_changed([user_id])
 
     def make_assignment(
         self, duty_date, prev_user_id: int | None, new_user_id: int | None
@@ -130,10 +306,102 @@ class ManageAssignments:
         elif prev_user_id and new_user_id is None:
             self.delete_assignment(duty_date, user_id=prev_user_id)
 
-    def get_staff_duties(self, start_date: datetime.date, end_date: datetime.date):
-        stats = self.duty_assignment_repo.get_duty_stats(
-            start_date=start_date, end_date=end_date
+    def get_assignment_delta(
+        self, duty_date: datetime.date, user_ids: list[int]
+    ) -> tuple[Duty | None, QuerySet[Staff]]:
+        duty = self.duty_repo.get_list_of_duties(duty_date, duty_date).first()
+        return duty, self.staff_repo.get_by_ids(user_ids)
+
+    def touch_duties(self, ids: list[int]) -> None:
+        self.duty_repo.touch(ids)
+
+    def on_assignments_changed(self, user_ids: Iterable[int]) -> None:
+        """Called after the assignments of these users were written."""
+
+    def get_user_calendar(
+        self, user_id: int, start_date: datetime.date | None = None
+    ) -> dict | None:
+        """Renders the ICS feed of a staff member's duties from start_date on.
+
+        Returns the calendar ``body`` with its ``digest`` and the time the
+        rendered data was last ``updated_at``, or None when there is no such
+        staff member. DTSTAMP is that time too, so the digest only changes
+        with the data.
+        """
+        duties = self.get_user_duties(user_id)
+        if duties is None:
+            return None
+        user, assignments = duties
+        if start_date is None:
+            start_date = timezone.localdate() - datetime.timedelta(
+                days=CALENDAR_PAST_DAYS
+            )
+        assignments = [a for a in assignments if a.duty.date >= start_date]
+        updated_at = max(
+            [user.updated_at]
+            + [assignment.duty.updated_at for assignment in assignments]
+        )
+        body = "".join(
+            stream_assignments_ics(assignments, f"Дежурства: {user}", updated_at)
         )
+        return {
+            "body": body,
+            "digest": hashlib.md5(body.encode(), usedforsecurity=False).hexdigest(),
+            "updated_at": updated_at,
+        }
+
+    def get_user_duties(
+        self, user_id: int
+    ) -> tuple[Staff, list[DutyAssignment]] | None:
+        """Returns a staff member with all their assignments, or None."""
+        user = self.staff_repo.get_by_ids([user_id]).first()
+        if user is None:
+            return None
+        return user, list(self.duty_assignment_repo.get_user_assignments(user_id))
+
+    def get_staff_stamp(self) -> tuple:
+        stamp = self.staff_repo.get_stamp()
+        return stamp["count"], stamp["updated_at"]
+
+    def get_schedule_stamp(
+        self, start_date: datetime.date, end_date: datetime.date
+    ) -> tuple:
+        stamp = self.duty_repo.get_range_stamp(start_date, end_date)
+        return (
+            start_date,
+            end_date,
+            stamp["count"],
+            stamp["updated_at"],
+        ) + self.get_staff_stamp()
+
+    def get_duty_stats(
+        self, start_date: datetime.date, end_date: datetime.date
+    ) -> list[dict]:
+        """Counts duties per user and month.
+
+        Whole months come from the rollup table; the partial months at the
+        edges of the range are counted over raw assignments.
+        """
+        months = full_months(start_date, end_date)
+        if months is None:
+            return list(self.duty_assignment_repo.get_duty_stats(start_date, end_date))
+        first_month, last_month = months
+        stats = list(self.stats_repo.get_duty_stats(first_month, last_month))
+        if start_date < first_month:
+            stats += self.duty_assignment_repo.get_duty_stats(
+                start_date, first_month - datetime.timedelta(days=1)
+            )
+        month_after = (last_month + datetime.timedelta(days=31)).replace(day=1)
+        if end_date >= month_after:
+            stats += self.duty_assignment_repo.get_duty_stats(month_after, end_date)
+        stats.sort(key=lambda x: (x["user__email"], x["month"]))
+        return stats
+
+    def rebuild_stats(self) -> int:
+        return self.stats_repo.rebuild(self.duty_assignment_repo.get_month_counts())
+
+    def get_staff_duties(self, start_date: datetime.date, end_date: datetime.date):
+        stats = self.get_duty_stats(start_date, end_date)
         grouped_stats = itertools.groupby(stats, key=lambda x: x["user_id"])
         result = []
         for key, values in grouped_stats:
@@ -144,6 +412,196 @@ class ManageAssignments:
             result.append({"user": key, "duties": duties})
         return result
 
-    def bulk_delete_duties_by_id(self, ids: list[int]) -> int:
-        count = self.duty_repo.bulk_delete_by_id(ids)
-        return count
+    def delete_duties_by_id(self, ids: list[int]) -> dict[str, int]:
+        """Deletes duties with their assignments, returning per-model counts."""
+        with transaction.atomic():
+            counts = self.duty_assignment_repo.get_month_counts(ids)
+            deleted = self.duty_repo.delete_by_ids(ids)
+            self.stats_repo.add({key: -value for key, value in counts.items()})
+        self.on_assignments_changed({user_id for user_id, _ in counts})
+        return deleted
+
+    def delete_duties_in_range(
+        self, start_date: datetime.date, end_date: datetime.date
+    ) -> dict[str, int]:
+        """Deletes every duty of the range, see delete_duties_by_id."""
+        with transaction.atomic():
+            counts = self.duty_assignment_repo.get_month_counts(
+                start_date=start_date, end_date=end_date
+            )
+            deleted = self.duty_repo.delete_in_range(start_date, end_date)
+            self.stats_repo.add({key: -value for key, value in counts.items()})
+        self.on_assignments_changed({user_id for user_id, _ in counts})
+        return deleted
+
+
+class CachedManageAssignments(ManageAssignments):
+    """ManageAssignments with schedule reads served from ScheduleCache.
+
+    Cached reads return evaluated lists. Every write method invalidates the
+    months it touched; staff edits invalidate everything that renders staff.
+    Personal calendar data is keyed by user only, is kept without a timeout
+    and are invalidated through on_assignments_changed or when that staff
+    member is edited. Staff priorities are not part of any cached payload and
+    do not invalidate it.
+    """
+
+    def __init__(self, cache: ScheduleCache | None = None):
+        super().__init__()
+        self.cache = cache or ScheduleCache()
+
+    def get_duties_by_date(
+        self, start_date: datetime.date, end_date: datetime.date | None = None
+    ) -> list[Duty]:  # type: ignore[override]
+        start_date, end_date = self._resolve_date_range(start_date, end_date)
+        return self.cache.get_or_load(
+            "duties",
+            (start_date, end_date),
+            month_scopes(start_date, end_date) + [STAFF_SCOPE],
+            lambda: list(
+                super(CachedManageAssignments, self).get_duties_by_date(
+                    start_date, end_date
+                )
+            ),
+        )
+
+    def get_staff_duties(self, start_date: datetime.date, end_date: datetime.date):
+        return self.cache.get_or_load(
+            "staff-duties",
+            (start_date, end_date),
+            month_scopes(start_date, end_date) + [STAFF_SCOPE],
+            lambda: super(CachedManageAssignments, self).get_staff_duties(
+                start_date, end_date
+            ),
+        )
+
+    def get_staff_list(self) -> list[Staff]:
+        return self.cache.get_or_load(
+            "staff", (), [STAFF_SCOPE], lambda: list(self.get_all_staff())
+        )
+
+    def invalidate_staff(self, user_ids: Iterable[int] = ()) -> None:
+        self.cache.invalidate_staff(user_ids)
+
+    def on_assignments_changed(self, user_ids: Iterable[int]) -> None:
+        self.cache.invalidate_users(user_ids)
+
+    def get_user_duties(
+        self, user_id: int
+    ) -> tuple[Staff, list[DutyAssignment]] | None:
+        # Keyed by user only, so the entry does not move with today's date;
+        # get_user_calendar filters and renders it per request.
+        return self.cache.get_or_load(
+            "user-duties",
+            (user_id,),
+            [user_scope(user_id)],
+            lambda: super(CachedManageAssignments, self).get_user_duties(user_id),
+            persistent=True,
+        )
+
+    def create_plan(
+        self,
+        start_date,
+        end_date,
+        people_per_day,
+        solver: str = DEFAULT_SOLVER,
+        seed: int | random.Random | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        trace: PlanTrace | None = None,
+    ) -> dict:
+        errors = super().create_plan(
+            start_date,
+            end_date,
+            people_per_day,
+            solver=solver,
+            seed=seed,
+            progress=progress,
+            trace=trace,
+        )
+        self.cache.invalidate_range(start_date, end_date)
+        return errors
+
+    def create_plans(
+        self,
+        date_sets: list[list[datetime.date]],
+        people_per_day,
+        solver: str = DEFAULT_SOLVER,
+        seed: int | random.Random | None = None,
+    ) -> dict:
+        errors = super().create_plans(date_sets, people_per_day, solver, seed)
+        for dates in date_sets:
+            self.cache.invalidate_range(min(dates), max(dates))
+        return errors
+
+    def replan(
+        self,
+        start_date,
+        end_date,
+        people_per_day,
+        seed: int | random.Random | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        trace: PlanTrace | None = None,
+    ) -> dict:
+        errors = super().replan(
+            start_date,
+            end_date,
+            people_per_day,
+            seed=seed,
+            progress=progress,
+            trace=trace,
+        )
+        self.cache.invalidate_range(start_date, end_date)
+        return errors
+
+    def upsert_duty_days(self, dates: list[datetime.date]) -> dict:
+        days = super().upsert_duty_days(dates)
+        self.cache.invalidate_dates(days["created"])
+        return days
+
+    def create_days_off(
+        self, user_id: int, dates: list[datetime.date]
+    ) -> list[DaysOff]:
+        days_off = super().create_days_off(user_id, dates)
+        self.cache.invalidate_dates(dates)
+        return days_off
+
+    def import_days_off(self, pairs: list[tuple[int, datetime.date]]) -> None:
+        super().import_days_off(pairs)
+        self.cache.invalidate_dates(date for _, date in pairs)
+
+    def create_assignment(
+        self, duty_date: datetime.date, user_id: int
+    ) -> DutyAssignment:
+        duty_assignment = super().create_assignment(duty_date, user_id)
+        self.cache.invalidate_dates([duty_date])
+        return duty_assignment
+
+    def update_assignment(
+        self, duty_date: datetime.date, prev_user_id: int, new_user_id: int
+    ) -> DutyAssignment:
+        duty_assignment = super().update_assignment(
+            duty_date, prev_user_id, new_user_id
+        )
+        self.cache.invalidate_dates([duty_date])
+        return duty_assignment
+
+    def delete_assignment(self, duty_date: datetime.date, user_id: int) -> None:
+        super().delete_assignment(duty_date, user_id)
+        self.cache.invalidate_dates([duty_date])
+
+    def touch_duties(self, ids: list[int]) -> None:
+        super().touch_duties(ids)
+        self.cache.invalidate_dates(self.duty_repo.get_dates_by_ids(ids))
+
+    def delete_duties_by_id(self, ids: list[int]) -> dict[str, int]:
+        dates = self.duty_repo.get_dates_by_ids(ids)
+        deleted = super().delete_duties_by_id(ids)
+        self.cache.invalidate_dates(dates)
+        return deleted
+
+    def delete_duties_in_range(
+        self, start_date: datetime.date, end_date: datetime.date
+    ) -> dict[str, int]:
+        deleted = super().delete_duties_in_range(start_date, end_date)
+        self.cache.invalidate_range(start_date, end_date)
+        return deleted
@@ -0,0 +1,124 @@
+import datetime
+import hashlib
+import logging
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+STAFF_SCOPE = "staff"
+_MISSING = object()
+
+
+def month_scope(day: datetime.date) -> str:
+    return f"month:{day.year:04d}-{day.month:02d}"
+
+
+def user_scope(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def month_scopes(start_date: datetime.date, end_date: datetime.date) -> list[str]:
+    scopes = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        scopes.append(month_scope(datetime.date(year, month, 1)))
+        year, month = (year, month + 1) if month < 12 else (year + 1, 1)
+    return scopes
+
+
+class ScheduleCache:
+    """Read-through cache for schedule reads.
+
+    Every entry key includes the current version of each scope it depends on:
+    the months of its date range and the staff list. A write replaces the
+    versions of the scopes it touched, so only entries over those months are
+    missed afterwards and the old ones simply expire. Versions are fresh
+    timestamps rather than counters, so an evicted version never brings a
+    stale entry back.
+
+    Inside a transaction a write bumps its scopes at once and again on commit;
+    until then the cache is bypassed, so uncommitted rows are never stored.
+    """
+
+    def __init__(self, alias: str | None = None, timeout: int | None = None):
+        self.cache = caches[alias or settings.PLANNER_CACHE_ALIAS]
+        self.timeout = settings.PLANNER_CACHE_TIMEOUT if timeout is None else timeout
+        self.dirty = False
+
+    @staticmethod
+    def _version_key(scope: str) -> str:
+        return f"planner:version:{scope}"
+
+    def _versions(self, scopes: list[str]) -> list[int]:
+        keys = [self._version_key(scope) for scope in scopes]
+        versions = self.cache.get_many(keys)
+        missing = {key: time.time_ns() for key in keys if key not in versions}
+        if missing:
+            self.cache.set_many(missing, timeout=None)
+            versions.update(missing)
+        return [versions[key] for key in keys]
+
+    def _bump(self, scopes: list[str]) -> None:
+        version = time.time_ns()
+        self.cache.set_many(
+            {self._version_key(scope): version for scope in scopes}, timeout=None
+        )
+
+    def get_or_load(
+        self,
+        name: str,
+        args: tuple,
+        scopes: list[str],
+        loader: Callable[[], Any],
+        persistent: bool = False,
+    ) -> Any:
+        """Returns the cached value, calling ``loader`` on a miss.
+
+        ``persistent`` entries are stored without a timeout and live until
+        their scopes are invalidated or the cache evicts them.
+        """
+        if self.dirty:
+            return loader()
+        digest = hashlib.md5(
+            repr((args, self._versions(scopes))).encode(), usedforsecurity=False
+        ).hexdigest()
+        key = f"planner:{name}:{digest}"
+        value = self.cache.get(key, _MISSING)
+        if value is _MISSING:
+            logger.debug("cache miss: %s%s", name, args)
+            value = loader()
+            self.cache.set(key, value, None if persistent else self.timeout)
+        return value
+
+    def invalidate(self, scopes: Iterable[str]) -> None:
+        scopes = sorted(set(scopes))
+        if not scopes:
+            return
+        self._bump(scopes)
+        if connection.in_atomic_block:
+            self.dirty = True
+            transaction.on_commit(lambda: self._on_commit(scopes))
+
+    def _on_commit(self, scopes: list[str]) -> None:
+        self._bump(scopes)
+        self.dirty = False
+
+    def invalidate_dates(self, dates: Iterable[datetime.date]) -> None:
+        self.invalidate(month_scope(day) for day in dates)
+
+    def invalidate_range(
+        self, start_date: datetime.date, end_date: datetime.date
+    ) -> None:
+        self.invalidate(month_scopes(start_date, end_date))
+
+    def invalidate_staff(self, user_ids: Iterable[int] = ()) -> None:
+        self.invalidate([STAFF_SCOPE, *(user_scope(user_id) for user_id in user_ids)])
+
+    def invalidate_users(self, user_ids: Iterable[int]) -> None:
+        self.invalidate(user_scope(user_id) for user_id in user_ids)
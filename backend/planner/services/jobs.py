@@ -0,0 +1,118 @@
+import datetime
+import logging
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from planner.models import GenerationJob
+from planner.services.assignments import CachedManageAssignments, ManageAssignments
+from planner.services.repositories.generation_job_repository import (
+    GenerationJobRepository,
+)
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 0.5
+
+
+class GenerationJobs:
+    """Runs plan generation outside the request.
+
+    ``generate`` stores its parameters as a pending job; a worker
+    (``manage.py run_generation_worker``) claims jobs one by one and runs
+    them, writing progress as duties are solved. The plan is not wrapped in
+    an outer transaction so that progress is visible while it runs; the
+    plan's own writes stay atomic.
+    """
+
+    def __init__(self, assignments: ManageAssignments | None = None):
+        self.job_repo = GenerationJobRepository()
+        self.assignments = assignments or CachedManageAssignments()
+
+    def submit(
+        self,
+        dates: list[datetime.date],
+        people_per_day: int,
+        solver: str,
+        seed: int,
+        replan: bool = False,
+    ) -> GenerationJob:
+        return self.job_repo.create(
+            params={
+                "dates": [d.isoformat() for d in dates],
+                "people_per_day": people_per_day,
+                "solver": solver,
+                "seed": seed,
+                "replan": replan,
+            }
+        )
+
+    def get_all(self):
+        return self.job_repo.get_all()
+
+    def run_pending(self) -> int:
+        self.fail_stale()
+        processed = 0
+        while (job := self.job_repo.claim_next()) is not None:
+            self.run(job)
+            processed += 1
+        return processed
+
+    def fail_stale(self) -> int:
+        """Fails jobs left running longer than ``PLANNER_JOB_TIMEOUT``."""
+        started_before = timezone.now() - datetime.timedelta(
+            seconds=settings.PLANNER_JOB_TIMEOUT
+        )
+        failed = self.job_repo.fail_stale(
+            started_before, "Задание прервано: обработчик остановился"
+        )
+        if failed:
+            logger.warning("failed %s stale generation jobs", failed)
+        return failed
+
+    def run(self, job: GenerationJob) -> GenerationJob:
+        logger.info("run generation job %s", job.id)
+        params = job.params
+        try:
+            dates = sorted(datetime.date.fromisoformat(d) for d in params["dates"])
+            if not params["replan"]:
+                dates = self.assignments.create_duty_days(dates)
+            start_date, end_date = self.assignments.get_date_range(dates)
+            progress = self._progress_writer(job)
+            if params["replan"]:
+                errors = self.assignments.replan(
+                    start_date,
+                    end_date,
+                    params["people_per_day"],
+                    seed=params["seed"],
+                    progress=progress,
+                )
+            else:
+                errors = self.assignments.create_plan(
+                    start_date,
+                    end_date,
+                    params["people_per_day"],
+                    solver=params["solver"],
+                    seed=params["seed"],
+                    progress=progress,
+                )
+        except Exception as e:
+            logger.exception("generation job %s failed", job.id)
+            self.job_repo.fail(job, str(e))
+        else:
+            self.job_repo.finish(job, errors)
+        return job
+
+    def _progress_writer(self, job: GenerationJob):
+        last_write = 0.0
+
+        def write(done: int, total: int) -> None:
+            nonlocal last_write
+            job.progress_total = total
+            now = time.monotonic()
+            if done < total and now - last_write < PROGRESS_INTERVAL:
+                return
+            last_write = now
+            self.job_repo.update_progress(job.id, done, total)
+
+        return write
@@ -1,17 +1,28 @@
-import heapq
 import logging
-from random import shuffle
+import random
+from collections import Counter
+from collections.abc import Callable
 
 from django.db import transaction
+from planner.models import month_start
 
 from .repositories.days_off_repository import DaysOffRepository
 from .repositories.duty_assignment_repository import DutyAssignmentRepository
 from .repositories.duty_repository import DutyRepository
+from .repositories.staff_month_stats_repository import StaffMonthStatsRepository
 from .repositories.staff_repository import StaffRepository
-from .staff_availability import StaffAvailability
+from .solvers import DEFAULT_SOLVER, GreedyHeapSolver, PlanSolver, get_solver
+from .staff_availability import StaffAvailabilitySnapshot
+from .tracing import PlanTrace
 
 logger = logging.getLogger(__name__)
 
+MAX_SEED = 2**32 - 1
+
+
+def new_seed() -> int:
+    return random.SystemRandom().randint(0, MAX_SEED)
+
 
 class Planner:
     def __init__(
@@ -23,25 +34,48 @@ class Planner:
         staff_repo=None,
         days_off_repo=None,
         duty_assignment_repo=None,
+        stats_repo=None,
+        solver: str | PlanSolver = DEFAULT_SOLVER,
+        seed: int | random.Random | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        trace: PlanTrace | None = None,
     ):
         self.duty_repo = duty_repo or DutyRepository()
         self.staff_repo = staff_repo or StaffRepository()
         self.days_off_repo = days_off_repo or DaysOffRepository()
         self.duty_assignment_repo = duty_assignment_repo or DutyAssignmentRepository()
+        self.stats_repo = stats_repo or StaffMonthStatsRepository()
+        self.solver = get_solver(solver) if isinstance(solver, str) else solver
+        if isinstance(seed, random.Random):
+            self.seed = None
+            self.rng = seed
+        else:
+            self.seed = new_seed() if seed is None else seed
+            self.rng = random.Random(self.seed)
+        self.progress = progress
+        self.trace = trace or PlanTrace()
         self.messages = {}
+        self.priorities: dict[int, int] = {}
+        self.changed_users: set[int] = set()
         self.people_for_day: int = people_for_day
         self.start_date = start_date
         self.end_date = end_date
 
-    def update_priority(self, user_id, value=None, diff=None):
-        self.staff_repo.update_priority(user_id, value, diff)
+    def save_changed_priorities(
+        self, priorities: dict[int, int], stored: dict[int, int]
+    ) -> int:
+        """Saves only the priorities that differ from the ``stored`` ones."""
+        return self.staff_repo.bulk_update_priority(
+            {
+                user_id: priority
+                for user_id, priority in priorities.items()
+                if priority != stored.get(user_id)
+            }
+        )
 
     def set_minimum_priority(self):
         logger.info("Set minimum priority")
-        with transaction.atomic():
-            min_priority = self.staff_repo.get_minimum_priority()
-            if min_priority is not None:
-                self.staff_repo.set_minimum_priority_for_all(min_priority)
+        self.staff_repo.normalize_priorities()
 
     def save_messages(self, count, duty):
         dt = duty.date.strftime("%Y-%m-%d")
@@ -59,43 +93,144 @@ class Planner:
             )
         return self.messages
 
-    def create_plan(self):
-        duties_for_month = self.duty_repo.get_list_of_duties(
-            self.start_date, self.end_date, ordered=True
+    @staticmethod
+    def count_by_month(assignments, duties) -> Counter:
+        month_by_duty = {duty.id: month_start(duty.date) for duty in duties}
+        return Counter(
+            (user_id, month_by_duty[duty_id]) for user_id, duty_id in assignments
+        )
+
+    def create_plan(
+        self,
+        users: list[tuple[int, int]] | None = None,
+        save_priorities: bool = True,
+    ):
+        """Fills the duties of the window and saves the new assignments.
+
+        ``users`` are ``(priority, user_id)`` pairs to start from instead of
+        the stored staff; the resulting priorities are kept in
+        ``self.priorities`` and saved unless ``save_priorities`` is false,
+        so several windows can be planned in a row over one staff state.
+        """
+        duties_for_month = list(
+            self.duty_repo.get_list_of_duties(
+                self.start_date, self.end_date, ordered=True
+            )
+        )
+        staff_availability = StaffAvailabilitySnapshot(
+            self.start_date,
+            self.end_date,
+            days_off_repo=self.days_off_repo,
+            duty_repo=self.duty_repo,
+            duty_assignment_repo=self.duty_assignment_repo,
+        )
+
+        if users is None:
+            staff = self.staff_repo.get_all()
+            users = [(user.priority, user.id) for user in staff]
+            self.rng.shuffle(users)
+        stored = {user_id: priority for priority, user_id in users}
+        logger.info(
+            "plan %s - %s, %s duties, %s per day, seed %s",
+            self.start_date,
+            self.end_date,
+            len(duties_for_month),
+            self.people_for_day,
+            self.seed,
+        )
+        if self.trace.enabled:
+            self.trace.record(
+                "plan",
+                start_date=self.start_date,
+                end_date=self.end_date,
+                people_for_day=self.people_for_day,
+                seed=self.seed,
+                solver=self.solver.name,
+                staff=len(users),
+            )
+        solution = self.solver.solve(
+            duties_for_month,
+            users,
+            self.people_for_day,
+            staff_availability,
+            progress=self.progress,
+            trace=self.trace,
         )
-        logger.info("duties for month: %s", duties_for_month)
-        staff_availability = StaffAvailability()
-
-        staff = self.staff_repo.get_all()
-        users = [(user.priority, user.id) for user in staff]
-        shuffle(users)
-        heapq.heapify(users)
-        logger.info(self.people_for_day)
-        logger.info("users before generation: %s", users)
         for duty in duties_for_month:
+            self.save_messages(solution.counts[duty.id], duty)
+
+        with transaction.atomic():
+            self.duty_assignment_repo.bulk_create(solution.assignments)
+            self.stats_repo.add(
+                self.count_by_month(solution.assignments, duties_for_month)
+            )
+            self.duty_repo.touch({duty_id for _, duty_id in solution.assignments})
+            if save_priorities:
+                self.save_changed_priorities(solution.priorities, stored)
+        self.priorities = solution.priorities
+        self.changed_users.update(user_id for user_id, _ in solution.assignments)
+        return self.messages
+
+    def replan(self):
+        """Re-plans only the duties broken by changed availability.
+
+        Assignments falling on a day off of their user or right next to
+        another duty of theirs are dropped and their priority increments are
+        undone; only those duties are then refilled, greedily and with both
+        neighbouring duties checked. All other assignments and priorities are
+        left as they are.
+        """
+        staff_availability = StaffAvailabilitySnapshot(
+            self.start_date,
+            self.end_date,
+            days_off_repo=self.days_off_repo,
+            duty_repo=self.duty_repo,
+            duty_assignment_repo=self.duty_assignment_repo,
+            check_next=True,
+        )
+        conflicts = staff_availability.pop_conflicts()
+        logger.info(
+            "replan %s - %s: %s conflicts",
+            self.start_date,
+            self.end_date,
+            len(conflicts),
+        )
+        if self.trace.enabled:
+            self.trace.record("conflicts", assignments=conflicts)
+        if not conflicts:
+            return self.messages
+
+        released = Counter(user_id for user_id, _ in conflicts)
+        with transaction.atomic():
+            self.duty_assignment_repo.delete_pairs(conflicts)
+            duties = list(
+                self.duty_repo.get_list_of_duties_by_ids(
+                    {duty_id for _, duty_id in conflicts}
+                )
+            )
+            stored = {user.id: user.priority for user in self.staff_repo.get_all()}
+            users = [
+                (max(priority - released[user_id], 0), user_id)
+                for user_id, priority in stored.items()
+            ]
+            self.rng.shuffle(users)
+            solution = GreedyHeapSolver().solve(
+                duties,
+                users,
+                self.people_for_day,
+                staff_availability,
+                progress=self.progress,
+                trace=self.trace,
+            )
+            for duty in duties:
+                self.save_messages(solution.counts[duty.id], duty)
 
-            logger.info("duty day: %s", duty.date)
-            count = self.duty_assignment_repo.get_count_by_duty_id(duty.id)
-            logger.info("count for day: %s", count)
-            added_users = []
-            while users and count < self.people_for_day:
-
-                user_priority, user_id = heapq.heappop(users)
-                logger.info("chosen: %s", (user_priority, user_id))
-                if not staff_availability.is_unavailable(user_id, duty.date):
-                    self.duty_assignment_repo.create(user_id=user_id, duty=duty)
-                    count += 1
-                    added_users.append((user_priority + 1, user_id))
-                    logger.info("added assignment: %s", (user_priority, user_id))
-                else:
-                    added_users.append((user_priority, user_id))
-                    logger.info("not added assignment: %s", (user_priority, user_id))
-
-            for user in added_users:
-                heapq.heappush(users, user)
-            logger.info("heap after assignment: %s", users)
-            self.save_messages(count, duty)
-
-        for user_priority, user_id in users:
-            self.update_priority(user_id, value=user_priority)
+            self.duty_assignment_repo.bulk_create(solution.assignments)
+            counts = self.count_by_month(solution.assignments, duties)
+            counts.subtract(self.count_by_month(conflicts, duties))
+            self.stats_repo.add(counts)
+            self.duty_repo.touch([duty.id for duty in duties])
+            self.save_changed_priorities(solution.priorities, stored)
+        self.changed_users.update(released)
+        self.changed_users.update(user_id for user_id, _ in solution.assignments)
         return self.messages
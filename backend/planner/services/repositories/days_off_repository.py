@@ -4,6 +4,8 @@ from django.db.models import QuerySet
 from planner.models import DaysOff
 from planner.services.repositories.base_repository import BaseRepository
 
+IMPORT_BATCH_SIZE = 1000
+
 
 class DaysOffRepository(BaseRepository[DaysOff]):
     model = DaysOff
@@ -12,6 +14,13 @@ class DaysOffRepository(BaseRepository[DaysOff]):
     def exists_for_user_in_date(self, user_id: int, date: datetime.date) -> bool:
         return DaysOff.objects.filter(user_id=user_id, date=date).exists()
 
+    def get_user_date_pairs(
+        self, start_date: datetime.date, end_date: datetime.date
+    ) -> QuerySet:
+        return DaysOff.objects.filter(
+            date__gte=start_date, date__lte=end_date
+        ).values_list("user_id", "date")
+
     def get_list_of_days_off(
         self, start_date: datetime.date, end_date: datetime.date
     ) -> QuerySet[DaysOff]:
@@ -23,3 +32,10 @@ class DaysOffRepository(BaseRepository[DaysOff]):
         return DaysOff.objects.bulk_create(
             [DaysOff(user_id=user_id, date=date) for date in dates]
         )
+
+    def bulk_create_pairs(self, pairs: list[tuple[int, datetime.date]]) -> None:
+        DaysOff.objects.bulk_create(
+            [DaysOff(user_id=user_id, date=date) for user_id, date in pairs],
+            batch_size=IMPORT_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
@@ -1,6 +1,6 @@
 import datetime
 
-from django.db.models import Count, QuerySet
+from django.db.models import Count, Q, QuerySet
 from django.db.models.functions import TruncMonth
 from planner.models import DutyAssignment, Staff
 from planner.services.repositories.base_repository import BaseRepository
@@ -12,6 +12,28 @@ class DutyAssignmentRepository(BaseRepository[DutyAssignment]):
     def user_has_assignment_for_duty_id(self, user_id: int, duty_id: int) -> bool:
         return DutyAssignment.objects.filter(user_id=user_id, duty_id=duty_id).exists()
 
+    def get_user_duty_pairs(self, duty_ids: list[int]) -> QuerySet:
+        return DutyAssignment.objects.filter(duty_id__in=duty_ids).values_list(
+            "user_id", "duty_id"
+        )
+
+    def bulk_create(self, pairs: list[tuple[int, int]]) -> list[DutyAssignment]:
+        return DutyAssignment.objects.bulk_create(
+            [
+                DutyAssignment(user_id=user_id, duty_id=duty_id)
+                for user_id, duty_id in pairs
+            ]
+        )
+
+    def delete_pairs(self, pairs: list[tuple[int, int]]) -> int:
+        if not pairs:
+            return 0
+        condition = Q()
+        for user_id, duty_id in pairs:
+            condition |= Q(user_id=user_id, duty_id=duty_id)
+        deleted, _ = DutyAssignment.objects.filter(condition).delete()
+        return deleted
+
     def get_list_of_duty_assignment(
         self, start_date: datetime.date, end_date: datetime.date
     ) -> QuerySet[DutyAssignment]:
@@ -19,6 +41,14 @@ class DutyAssignmentRepository(BaseRepository[DutyAssignment]):
             duty__date__gte=start_date, duty__date__lte=end_date
         ).select_related("duty", "user")
 
+    def get_user_assignments(
+        self, user_id: int, start_date: datetime.date | None = None
+    ) -> QuerySet[DutyAssignment]:
+        assignments = DutyAssignment.objects.filter(user_id=user_id)
+        if start_date is not None:
+            assignments = assignments.filter(duty__date__gte=start_date)
+        return assignments.select_related("duty", "user").order_by("duty__date")
+
     def get_assignment_by_duty_and_user(
         self, duty_id: int, user_id: int
     ) -> DutyAssignment | None:
@@ -52,3 +82,22 @@ class DutyAssignmentRepository(BaseRepository[DutyAssignment]):
             .annotate(duty_count=Count("id"))
             .order_by("user__email", "month")
         )
+
+    def get_month_counts(
+        self,
+        duty_ids: list[int] | None = None,
+        start_date: datetime.date | None = None,
+        end_date: datetime.date | None = None,
+    ) -> dict[tuple[int, datetime.date], int]:
+        qs = DutyAssignment.objects.all()
+        if duty_ids is not None:
+            qs = qs.filter(duty_id__in=duty_ids)
+        if start_date is not None and end_date is not None:
+            qs = qs.filter(duty__date__gte=start_date, duty__date__lte=end_date)
+        rows = (
+            qs.annotate(month=TruncMonth("duty__date"))
+            .values_list("user_id", "month")
+            .annotate(duty_count=Count("id"))
+            .order_by()
+        )
+        return {(user_id, month): count for user_id, month, count in rows}
@@ -1,7 +1,10 @@
 import datetime
 import logging
 
-from planner.models import Duty
+from django.db import connection, transaction
+from django.db.models import Count, Max, QuerySet
+from django.utils import timezone
+from planner.models import Duty, DutyAssignment
 from planner.services.repositories.base_repository import BaseRepository
 
 logger = logging.getLogger(__name__)
@@ -18,6 +21,14 @@ class DutyRepository(BaseRepository[Duty]):
             .last()
         )
 
+    def get_next_duty(self, date: datetime.date) -> int | None:
+        return (
+            Duty.objects.filter(date__gt=date)
+            .order_by("date")
+            .values_list("id", flat=True)
+            .first()
+        )
+
     def get_first_element_by_date(self, duty_date: datetime.date) -> Duty | None:
         return Duty.objects.filter(date=duty_date).first()
 
@@ -30,18 +41,108 @@ class DutyRepository(BaseRepository[Duty]):
 
         return qs.order_by("date") if ordered else qs
 
-    def save_duty_days(self, dates: list[datetime.date,]) -> list[datetime.date]:
-        Duty.objects.bulk_update_or_create(
-            [Duty(date=duty_date) for duty_date in dates],
-            update_fields=["date"],
-            match_field=["date"],
+    def get_list_of_duties_by_ids(self, ids):
+        return (
+            Duty.objects.filter(id__in=ids)
+            .prefetch_related("dutyassignment_set__user")
+            .order_by("date")
         )
-        data = self.get_list_of_duties(
-            start_date=dates[0], end_date=dates[-1], ordered=True
+
+    def get_list_of_duties_after(
+        self,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        after: datetime.date | None = None,
+    ):
+        qs = self.get_list_of_duties(start_date, end_date, ordered=True)
+        return qs.filter(date__gt=after) if after else qs
+
+    def get_id_date_pairs(self, start_date: datetime.date, end_date: datetime.date):
+        return (
+            Duty.objects.filter(date__gte=start_date, date__lte=end_date)
+            .order_by("date")
+            .values_list("id", "date")
         )
-        return [d.date for d in data]
 
-    def bulk_delete_by_id(self, ids: list[int]):
-        _, deleted_count = Duty.objects.filter(id__in=ids).delete()
-        logger.info("to delete %s", deleted_count)
-        return deleted_count.get("planner.Duty", None)
+    def get_dates_by_ids(self, ids) -> list[datetime.date]:
+        return list(Duty.objects.filter(id__in=ids).values_list("date", flat=True))
+
+    def get_range_stamp(
+        self, start_date: datetime.date, end_date: datetime.date
+    ) -> dict:
+        return Duty.objects.filter(date__gte=start_date, date__lte=end_date).aggregate(
+            count=Count("id"), updated_at=Max("updated_at")
+        )
+
+    def touch(self, ids) -> int:
+        return Duty.objects.filter(id__in=ids).update(updated_at=timezone.now())
+
+    def upsert_duty_days(
+        self, dates: list[datetime.date]
+    ) -> tuple[list[datetime.date], list[datetime.date]]:
+        """Creates the missing duties and returns the created and existing dates.
+
+        Existing rows are neither updated nor re-read; the insert skips dates
+        created concurrently, so calling it again for the same dates costs a
+        single SELECT.
+        """
+        existing = set(
+            Duty.objects.filter(date__in=dates).values_list("date", flat=True)
+        )
+        created = sorted(set(dates) - existing)
+        if created:
+            Duty.objects.bulk_create(
+                [Duty(date=duty_date) for duty_date in created], ignore_conflicts=True
+            )
+        return created, sorted(existing)
+
+    def delete_by_ids(self, ids: list[int]) -> dict[str, int]:
+        if not ids:
+            return {}
+        column = connection.ops.quote_name(Duty._meta.pk.column)
+        placeholders = ", ".join(["%s"] * len(ids))
+        return self._delete_cascade(
+            DutyAssignment.objects.filter(duty_id__in=ids),
+            f"{column} IN ({placeholders})",
+            ids,
+        )
+
+    def delete_in_range(
+        self, start_date: datetime.date, end_date: datetime.date
+    ) -> dict[str, int]:
+        column = connection.ops.quote_name(Duty._meta.get_field("date").column)
+        return self._delete_cascade(
+            DutyAssignment.objects.filter(
+                duty__date__gte=start_date, duty__date__lte=end_date
+            ),
+            f"{column} BETWEEN %s AND %s",
+            [
+                connection.ops.adapt_datefield_value(start_date),
+                connection.ops.adapt_datefield_value(end_date),
+            ],
+        )
+
+    def _delete_cascade(
+        self, assignments: QuerySet[DutyAssignment], where: str, params: list
+    ) -> dict[str, int]:
+        """Deletes the duties matching the SQL ``where`` with ``assignments``.
+
+        Column names in ``where`` are quoted by the caller.
+
+        DutyAssignment has no delete signals or dependants, so its
+        QuerySet.delete() is a single DELETE. Duty.objects.delete() would load
+        every duty to collect the cascade; once the assignments are gone the
+        duties are removed with an explicit DELETE instead. Model delete()
+        overrides are not called, callers keep the stats. Counts are keyed by
+        model label like QuerySet.delete() results.
+        """
+        with transaction.atomic(savepoint=False):
+            _, deleted = assignments.delete()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {connection.ops.quote_name(Duty._meta.db_table)} "
+                    f"WHERE {where}",
+                    params,
+                )
+                deleted[Duty._meta.label] = cursor.rowcount
+        return {label: count for label, count in deleted.items() if count}
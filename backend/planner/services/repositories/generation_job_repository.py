@@ -0,0 +1,58 @@
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+from planner.models import GenerationJob
+from planner.services.repositories.base_repository import BaseRepository
+
+
+class GenerationJobRepository(BaseRepository[GenerationJob]):
+    model = GenerationJob
+    default_ordering = "-created_at"
+
+    def claim_next(self) -> GenerationJob | None:
+        with transaction.atomic():
+            job = (
+                GenerationJob.objects.select_for_update(skip_locked=True)
+                .filter(status=GenerationJob.Status.PENDING)
+                .order_by("created_at")
+                .first()
+            )
+            if job is None:
+                return None
+            job.status = GenerationJob.Status.RUNNING
+            job.started_at = timezone.now()
+            job.save(update_fields=["status", "started_at"])
+        return job
+
+    def fail_stale(self, started_before: datetime.datetime, message: str) -> int:
+        """Fails running jobs started before ``started_before``.
+
+        A job stays RUNNING when its worker is killed mid-run; nothing else
+        would ever finish it.
+        """
+        return GenerationJob.objects.filter(
+            status=GenerationJob.Status.RUNNING, started_at__lt=started_before
+        ).update(
+            status=GenerationJob.Status.FAILED,
+            error=message,
+            finished_at=timezone.now(),
+        )
+
+    def update_progress(self, job_id: int, done: int, total: int) -> None:
+        GenerationJob.objects.filter(id=job_id).update(
+            progress_done=done, progress_total=total
+        )
+
+    def finish(self, job: GenerationJob, errors: dict) -> None:
+        job.status = GenerationJob.Status.DONE
+        job.errors = errors
+        job.progress_done = job.progress_total
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "errors", "progress_done", "finished_at"])
+
+    def fail(self, job: GenerationJob, message: str) -> None:
+        job.status = GenerationJob.Status.FAILED
+        job.error = message
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
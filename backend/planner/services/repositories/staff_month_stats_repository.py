@@ -0,0 +1,48 @@
+import datetime
+
+from django.db import transaction
+from planner.models import StaffMonthStats, month_start
+from planner.services.repositories.base_repository import BaseRepository
+
+
+def full_months(
+    start_date: datetime.date, end_date: datetime.date
+) -> tuple[datetime.date, datetime.date] | None:
+    """Returns the first and last month fully covered by the range."""
+    first = start_date if start_date.day == 1 else _next_month(start_date)
+    after_end = end_date + datetime.timedelta(days=1)
+    last = month_start(end_date) if after_end.day == 1 else _previous_month(end_date)
+    return (first, last) if first <= last else None
+
+
+def _next_month(day: datetime.date) -> datetime.date:
+    return (month_start(day) + datetime.timedelta(days=31)).replace(day=1)
+
+
+def _previous_month(day: datetime.date) -> datetime.date:
+    return month_start(month_start(day) - datetime.timedelta(days=1))
+
+
+class StaffMonthStatsRepository(BaseRepository[StaffMonthStats]):
+    model = StaffMonthStats
+
+    def add(self, counts: dict[tuple[int, datetime.date], int]) -> None:
+        StaffMonthStats.objects.add(counts)
+
+    def get_duty_stats(self, first_month: datetime.date, last_month: datetime.date):
+        return (
+            StaffMonthStats.objects.filter(
+                month__gte=first_month, month__lte=last_month, duty_count__gt=0
+            )
+            .values("user_id", "user__email", "month", "duty_count")
+            .order_by("user__email", "month")
+        )
+
+    def rebuild(self, counts: dict[tuple[int, datetime.date], int]) -> int:
+        with transaction.atomic():
+            StaffMonthStats.objects.all().delete()
+            created = StaffMonthStats.objects.bulk_create(
+                StaffMonthStats(user_id=user_id, month=month, duty_count=count)
+                for (user_id, month), count in counts.items()
+            )
+        return len(created)
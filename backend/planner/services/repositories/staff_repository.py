@@ -1,6 +1,6 @@
 import logging
 
-from django.db.models import F, Min
+from django.db.models import Count, F, Max, QuerySet, Subquery
 from django.db.models.functions import Greatest
 from planner.models import Staff
 from planner.services.repositories.base_repository import BaseRepository
@@ -12,6 +12,12 @@ class StaffRepository(BaseRepository[Staff]):
     model = Staff
     default_ordering = "email"
 
+    def get_stamp(self) -> dict:
+        return Staff.objects.aggregate(count=Count("id"), updated_at=Max("updated_at"))
+
+    def get_by_ids(self, ids: list[int]) -> QuerySet[Staff]:
+        return Staff.objects.filter(id__in=ids).order_by("id")
+
     def update_priority(self, user_id: int, value=None, diff=None) -> None:
         if value is not None:
             Staff.objects.filter(id=user_id).update(priority=Greatest(value, 0))
@@ -20,18 +26,41 @@ class StaffRepository(BaseRepository[Staff]):
                 priority=Greatest(F("priority") + diff, 0)
             )
 
-    def get_minimum_priority(self) -> int:
-        users = Staff.objects.filter(priority__gt=0)
-        min_priority = users.aggregate(min_priority=Min("priority"))["min_priority"]
-        return min_priority
+    def bulk_update_priority(self, priorities: dict[int, int]) -> int:
+        users = [
+            Staff(id=user_id, priority=max(value, 0))
+            for user_id, value in priorities.items()
+        ]
+        return Staff.objects.bulk_update(users, ["priority"])
 
-    def set_minimum_priority_for_all(self, min_priority: int) -> None:
-        users = Staff.objects.filter(priority__gt=0)
-        logger.info(
-            "пользователи после фильтрации: %s", [(u.priority, u.id) for u in users]
+    def normalize_priorities(self) -> int:
+        """Subtracts the smallest positive priority from every positive one.
+
+        Runs as one UPDATE with the minimum taken in a subquery; priorities
+        are read for logging only when debug logging is enabled.
+        """
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            before = dict(Staff.objects.values_list("id", "priority"))
+        min_priority = (
+            Staff.objects.filter(priority__gt=0)
+            .order_by("priority")
+            .values("priority")[:1]
         )
-        logger.info("min_priority: %s", min_priority)
-        users.update(priority=F("priority") - min_priority)
-        logger.info(
-            "пользователи после апдейта: %s", [(u.priority, u.id) for u in users]
+        updated = Staff.objects.filter(priority__gt=0).update(
+            priority=F("priority") - Subquery(min_priority)
         )
+        if debug:
+            after = dict(Staff.objects.values_list("id", "priority"))
+            logger.debug(
+                "normalized priorities of %s staff",
+                updated,
+                extra={
+                    "priorities": {
+                        user_id: (before.get(user_id), priority)
+                        for user_id, priority in after.items()
+                        if before.get(user_id) != priority
+                    }
+                },
+            )
+        return updated
@@ -0,0 +1,278 @@
+import heapq
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from typing import NamedTuple
+
+from planner.models import Duty
+
+from .staff_availability import StaffAvailabilitySnapshot
+from .tracing import NO_TRACE, PlanTrace
+
+
+class PlanSolution(NamedTuple):
+    assignments: list[tuple[int, int]]
+    priorities: dict[int, int]
+    counts: dict[int, int]
+
+
+class PlanSolver(ABC):
+    """Distributes staff over duties.
+
+    ``users`` is a list of ``(priority, user_id)`` pairs, ties are broken by
+    their order. The solution holds the new ``(user_id, duty_id)`` pairs, the
+    resulting priority of every user and the final head count of every duty.
+    ``progress`` is called with ``(duties processed, total)`` after each duty
+    and decisions are recorded in ``trace`` when it is enabled.
+    """
+
+    name: str
+
+    @abstractmethod
+    def solve(
+        self,
+        duties: list[Duty],
+        users: list[tuple[int, int]],
+        people_for_day: int,
+        availability: StaffAvailabilitySnapshot,
+        progress: Callable[[int, int], None] | None = None,
+        trace: PlanTrace = NO_TRACE,
+    ) -> PlanSolution: ...
+
+
+class GreedyHeapSolver(PlanSolver):
+    """Fills duties in date order with the lowest-priority available users.
+
+    A trace gets a ``duty`` event per duty, an ``assign`` or ``skip`` event
+    (with the rule that rejected the user) per popped candidate and a
+    ``filled`` event with the number of pops and the heap size.
+    """
+
+    name = "greedy"
+
+    def solve(
+        self,
+        duties,
+        users,
+        people_for_day,
+        availability,
+        progress=None,
+        trace=NO_TRACE,
+    ):
+        users = list(users)
+        heapq.heapify(users)
+        assignments = []
+        counts = {}
+        for done, duty in enumerate(duties, 1):
+            count = len(duty.dutyassignment_set.all())
+            if trace.enabled:
+                trace.record(
+                    "duty",
+                    date=duty.date,
+                    duty_id=duty.id,
+                    count=count,
+                    heap_size=len(users),
+                )
+            added_users = []
+            while users and count < people_for_day:
+
+                user_priority, user_id = heapq.heappop(users)
+                if not availability.is_unavailable(user_id, duty.date):
+                    assignments.append((user_id, duty.id))
+                    availability.add_assignment(user_id, duty.id)
+                    count += 1
+                    added_users.append((user_priority + 1, user_id))
+                    if trace.enabled:
+                        trace.record(
+                            "assign",
+                            duty_id=duty.id,
+                            user_id=user_id,
+                            priority=user_priority,
+                        )
+                else:
+                    added_users.append((user_priority, user_id))
+                    if trace.enabled:
+                        trace.record(
+                            "skip",
+                            duty_id=duty.id,
+                            user_id=user_id,
+                            priority=user_priority,
+                            reason=availability.unavailable_reason(user_id, duty.date),
+                        )
+
+            for user in added_users:
+                heapq.heappush(users, user)
+            if trace.enabled:
+                trace.record(
+                    "filled",
+                    duty_id=duty.id,
+                    count=count,
+                    pops=len(added_users),
+                    heap_size=len(users),
+                )
+            counts[duty.id] = count
+            if progress is not None:
+                progress(done, len(duties))
+
+        priorities = {user_id: user_priority for user_priority, user_id in users}
+        return PlanSolution(assignments, priorities, counts)
+
+
+class MinCostFlowSolver(PlanSolver):
+    """Fills duties with successive shortest augmenting paths.
+
+    The month is a flow network source -> user -> duty -> sink where the k-th
+    extra duty of a user costs ``priority + k``. Each missing slot is filled
+    along the cheapest residual path: a user may move from one of their new
+    duties to another so that a cheaper user can take the freed one, which
+    fills days a single greedy pass leaves short. Days off and existing
+    assignments are fixed and every move keeps the no-consecutive-duty rule.
+    """
+
+    name = "flow"
+
+    def solve(
+        self,
+        duties,
+        users,
+        people_for_day,
+        availability,
+        progress=None,
+        trace=NO_TRACE,
+    ):
+        user_ids = [user_id for _, user_id in users]
+        cost = [priority for priority, _ in users]
+        staff_range = range(len(user_ids))
+        movable: list[set[int]] = [set() for _ in staff_range]
+        occupied, candidates, counts = self._load(duties, user_ids, availability)
+
+        for i in range(len(duties)):
+            while counts[i] < people_for_day and self._augment(
+                i, candidates, occupied, movable, cost
+            ):
+                counts[i] += 1
+            if trace.enabled:
+                trace.record(
+                    "duty",
+                    date=duties[i].date,
+                    duty_id=duties[i].id,
+                    count=counts[i],
+                    users=sorted(user_ids[s] for s in staff_range if i in occupied[s]),
+                )
+            if progress is not None:
+                progress(i + 1, len(duties))
+
+        assignments = [
+            (user_ids[s], duties[i].id) for s in staff_range for i in sorted(movable[s])
+        ]
+        for user_id, duty_id in assignments:
+            availability.add_assignment(user_id, duty_id)
+        priorities = {user_ids[s]: cost[s] for s in staff_range}
+        return PlanSolution(
+            assignments, priorities, {d.id: c for d, c in zip(duties, counts)}
+        )
+
+    @staticmethod
+    def _load(duties, user_ids, availability):
+        """Builds occupied duty indices, candidates and head count per duty.
+
+        occupied holds every duty index a user sits on, -1 being the duty
+        before the window; only duties assigned during the run are movable.
+        """
+        index_by_user = {user_id: i for i, user_id in enumerate(user_ids)}
+        staff_range = range(len(user_ids))
+        occupied: list[set[int]] = [set() for _ in staff_range]
+        if duties:
+            for s in staff_range:
+                if availability.has_previous_duty(user_ids[s], duties[0].date):
+                    occupied[s].add(-1)
+
+        candidates = []
+        counts = []
+        for i, duty in enumerate(duties):
+            existing = [a.user_id for a in duty.dutyassignment_set.all()]
+            for user_id in existing:
+                if user_id in index_by_user:
+                    occupied[index_by_user[user_id]].add(i)
+            counts.append(len(existing))
+            candidates.append(
+                [
+                    s
+                    for s in staff_range
+                    if not availability.has_days_off(user_ids[s], duty.date)
+                ]
+            )
+        return occupied, candidates, counts
+
+    @staticmethod
+    def _can_take(occupied: set[int], i: int, leaving: int | None = None) -> bool:
+        if i in occupied:
+            return False
+        return all(n == leaving or n not in occupied for n in (i - 1, i + 1))
+
+    def _augment(self, root, candidates, occupied, movable, cost) -> bool:
+        """Fills one slot of duty ``root`` along the cheapest residual path.
+
+        A path state is a freed duty, its parent state, the user who left
+        the duty for the parent's one and the duties every user moved so far
+        sits on. Residual edges are checked per (user, duty) pair against
+        that occupancy, so a user moved earlier on the path can move again or
+        take the slot freed at the end. Each duty is expanded once.
+        """
+        lowest_cost = min(cost, default=0)
+        states: list[tuple[int, int, int, dict[int, set[int]]]] = [(root, -1, -1, {})]
+        reached = {root}
+        best = None
+        index = 0
+        while index < len(states):
+            i, _, _, moved = states[index]
+            for s in candidates[i]:
+                taken = moved.get(s, occupied[s])
+                if i in taken:
+                    continue
+                if (best is None or (cost[s], s) < best[0]) and self._can_take(
+                    taken, i
+                ):
+                    best = ((cost[s], s), index)
+                for j in movable[s]:
+                    if (
+                        j not in reached
+                        and j in taken
+                        and self._can_take(taken, i, leaving=j)
+                    ):
+                        reached.add(j)
+                        states.append((j, index, s, {**moved, s: taken - {j} | {i}}))
+            if best is not None and best[0][0] == lowest_cost:
+                break
+            index += 1
+
+        if best is None:
+            return False
+
+        (_, s), index = best
+        i = states[index][0]
+        occupied[s].add(i)
+        movable[s].add(i)
+        cost[s] += 1
+        while (parent := states[index][1]) != -1:
+            j, _, s, _ = states[index]
+            target = states[parent][0]
+            occupied[s].remove(j)
+            movable[s].remove(j)
+            occupied[s].add(target)
+            movable[s].add(target)
+            index = parent
+        return True
+
+
+SOLVERS: dict[str, type[PlanSolver]] = {
+    GreedyHeapSolver.name: GreedyHeapSolver,
+    MinCostFlowSolver.name: MinCostFlowSolver,
+}
+DEFAULT_SOLVER = GreedyHeapSolver.name
+
+
+def get_solver(name: str = DEFAULT_SOLVER) -> PlanSolver:
+    try:
+        return SOLVERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown solver: {name}") from None
@@ -25,14 +25,14 @@ class StaffAvailability:
         )
 
     def has_days_off(self, user_id: int, date: datetime.date) -> bool:
-        logger.info("Has day off")
+        logger.debug("Has day off")
         return self.days_off_repo.exists_for_user_in_date(user_id, date)
 
     def has_previous_duty(self, user_id: int, date: datetime.date) -> bool:
         duty_id = self.duty_repo.get_previous_duty(date)
         if duty_id is None:
             return False
-        logger.info("Has previous duty")
+        logger.debug("Has previous duty")
         return self.duty_assignment_repo.user_has_assignment_for_duty_id(
             user_id, duty_id
         )
@@ -41,7 +41,132 @@ class StaffAvailability:
         duty = self.duty_repo.get_first_element_by_date(date)
         if duty is None:
             return False
-        logger.info("Has current duty")
+        logger.debug("Has current duty")
         return self.duty_assignment_repo.user_has_assignment_for_duty_id(
             user_id, duty.id
         )
+
+
+class StaffAvailabilitySnapshot:
+    """In-memory availability for all duties between start_date and end_date.
+
+    Days off, duties of the window (plus the duty preceding it) and their
+    assignments are loaded once, so every check is answered from sets.
+    Assignments made while planning must be registered via add_assignment.
+
+    With ``check_next`` the duty following the window is loaded as well and a
+    user is also unavailable the day before their next duty, which is needed
+    when duties are filled out of date order.
+    """
+
+    def __init__(
+        self,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        days_off_repo: DaysOffRepository | None = None,
+        duty_repo: DutyRepository | None = None,
+        duty_assignment_repo: DutyAssignmentRepository | None = None,
+        check_next: bool = False,
+    ):
+        days_off_repo = days_off_repo or DaysOffRepository()
+        duty_repo = duty_repo or DutyRepository()
+        duty_assignment_repo = duty_assignment_repo or DutyAssignmentRepository()
+
+        self.days_off: set[tuple[int, datetime.date]] = set(
+            days_off_repo.get_user_date_pairs(start_date, end_date)
+        )
+        self.duty_by_date: dict[datetime.date, int] = {}
+        self.previous_duty_by_date: dict[datetime.date, int | None] = {}
+
+        previous_duty_id = duty_repo.get_previous_duty(start_date)
+        duty_ids = [] if previous_duty_id is None else [previous_duty_id]
+        for duty_id, duty_date in duty_repo.get_id_date_pairs(start_date, end_date):
+            self.duty_by_date[duty_date] = duty_id
+            self.previous_duty_by_date[duty_date] = previous_duty_id
+            previous_duty_id = duty_id
+            duty_ids.append(duty_id)
+
+        self.check_next = check_next
+        self.next_duty_by_date: dict[datetime.date, int | None] = {}
+        if check_next:
+            dates = list(self.duty_by_date)
+            following = [self.duty_by_date[d] for d in dates[1:]]
+            following.append(duty_repo.get_next_duty(end_date))
+            self.next_duty_by_date = dict(zip(dates, following))
+            if following[-1] is not None:
+                duty_ids.append(following[-1])
+
+        self.assignments: set[tuple[int, int]] = set(
+            duty_assignment_repo.get_user_duty_pairs(duty_ids)
+        )
+
+    def add_assignment(self, user_id: int, duty_id: int) -> None:
+        self.assignments.add((user_id, duty_id))
+
+    def remove_assignment(self, user_id: int, duty_id: int) -> None:
+        self.assignments.discard((user_id, duty_id))
+
+    def is_unavailable(self, user_id: int, date: datetime.date) -> bool:
+        return (
+            self.has_days_off(user_id, date)
+            or self.has_previous_duty(user_id, date)
+            or self.has_current_duty(user_id, date)
+            or (self.check_next and self.has_next_duty(user_id, date))
+        )
+
+    def unavailable_reason(self, user_id: int, date: datetime.date) -> str | None:
+        """Returns the rule that makes the user unavailable on date, if any."""
+        if self.has_days_off(user_id, date):
+            return "day_off"
+        if self.has_previous_duty(user_id, date):
+            return "previous_duty"
+        if self.has_current_duty(user_id, date):
+            return "assigned"
+        if self.check_next and self.has_next_duty(user_id, date):
+            return "next_duty"
+        return None
+
+    def pop_conflicts(self) -> list[tuple[int, int]]:
+        """Removes and returns assignments of the window that break the rules.
+
+        An assignment conflicts when it falls on a day off of the user or
+        right after another duty of theirs; of two consecutive duties the
+        later one is dropped, unless the later one lies after the window.
+        """
+        users_by_duty: dict[int, list[int]] = {}
+        for user_id, duty_id in sorted(self.assignments):
+            users_by_duty.setdefault(duty_id, []).append(user_id)
+
+        conflicts = []
+        last_date = max(self.duty_by_date, default=None)
+        for date, duty_id in sorted(self.duty_by_date.items()):
+            for user_id in users_by_duty.get(duty_id, []):
+                if (
+                    self.has_days_off(user_id, date)
+                    or self.has_previous_duty(user_id, date)
+                    or (date == last_date and self.has_next_duty(user_id, date))
+                ):
+                    self.remove_assignment(user_id, duty_id)
+                    conflicts.append((user_id, duty_id))
+        return conflicts
+
+    def has_days_off(self, user_id: int, date: datetime.date) -> bool:
+        return (user_id, date) in self.days_off
+
+    def has_previous_duty(self, user_id: int, date: datetime.date) -> bool:
+        duty_id = self.previous_duty_by_date.get(date)
+        if duty_id is None:
+            return False
+        return (user_id, duty_id) in self.assignments
+
+    def has_current_duty(self, user_id: int, date: datetime.date) -> bool:
+        duty_id = self.duty_by_date.get(date)
+        if duty_id is None:
+            return False
+        return (user_id, duty_id) in self.assignments
+
+    def has_next_duty(self, user_id: int, date: datetime.date) -> bool:
+        duty_id = self.next_duty_by_date.get(date)
+        if duty_id is None:
+            return False
+        return (user_id, duty_id) in self.assignments
@@ -0,0 +1,67 @@
+import json
+import logging
+import uuid
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TextIO
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+trace_logger = logging.getLogger("planner.trace")
+
+
+class PlanTrace:
+    """Structured record of planner decisions for a single run.
+
+    Off by default. It is enabled per run (``PlanTrace(enabled=True)``, e.g.
+    from a request flag) or, when ``enabled`` is left as None, for every run
+    by setting the ``planner.trace`` logger to DEBUG. Hot paths check
+    ``trace.enabled`` before building an event, so a disabled trace costs one
+    attribute lookup. Events are kept in ``events`` and logged to
+    ``planner.trace`` with the fields in ``extra["trace"]``.
+    """
+
+    def __init__(self, enabled: bool | None = None):
+        if enabled is None:
+            enabled = trace_logger.isEnabledFor(logging.DEBUG)
+        self.enabled = enabled
+        self.trace_id = uuid.uuid4().hex if self.enabled else ""
+        self.events: list[dict] = []
+
+    def record(self, event: str, **fields) -> None:
+        if not self.enabled:
+            return
+        fields["event"] = event
+        self.events.append(fields)
+        trace_logger.info("%s %s", event, self.trace_id, extra={"trace": fields})
+
+    def lines(self) -> Iterator[str]:
+        """Yields the events as JSON lines tagged with the trace id."""
+        for event in self.events:
+            yield json.dumps(
+                {"trace_id": self.trace_id, **event}, cls=DjangoJSONEncoder
+            )
+
+    def dump(self, fp: TextIO) -> None:
+        for line in self.lines():
+            fp.write(line + "\n")
+
+    def save(self, directory: str | Path | None = None) -> Path | None:
+        """Writes the events to ``<directory>/<trace_id>.jsonl``.
+
+        ``directory`` defaults to ``settings.PLANNER_TRACE_DIR``; nothing is
+        written when the trace is disabled or no directory is configured.
+        """
+        directory = directory or settings.PLANNER_TRACE_DIR
+        if not self.enabled or not directory:
+            return None
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        path = path / f"{self.trace_id}.jsonl"
+        with path.open("w", encoding="utf-8") as fp:
+            self.dump(fp)
+        return path
+
+
+NO_TRACE = PlanTrace(enabled=False)
@@ -0,0 +1,109 @@
+import csv
+import datetime
+from collections.abc import Iterable, Iterator
+
+from django.utils import timezone
+from planner.models import DutyAssignment
+from rest_framework.serializers import Serializer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def stream_json_data(
+    items: Iterable, serializer_class: type[Serializer]
+) -> Iterator[str]:
+    """Yields a ``{"data": [...]}`` document one serialized item at a time."""
+    encoder = JSONEncoder(ensure_ascii=False)
+    yield '{"data": ['
+    for i, item in enumerate(items):
+        if i:
+            yield ", "
+        yield encoder.encode(serializer_class(item).data)
+    yield "]}"
+
+
+class _Echo:
+    """File-like object whose write returns the line instead of storing it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+ASSIGNMENT_CSV_HEADER = ("date", "user_id", "email", "last_name", "first_name")
+
+
+def stream_assignments_csv(assignments: Iterable[DutyAssignment]) -> Iterator[str]:
+    """Yields a CSV document with one row per assignment."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ASSIGNMENT_CSV_HEADER)
+    for assignment in assignments:
+        user = assignment.user
+        yield writer.writerow(
+            (
+                assignment.duty.date.isoformat(),
+                user.id,
+                user.email,
+                user.last_name,
+                user.first_name,
+            )
+        )
+
+
+def _ics_text(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _ics_line(line: str) -> str:
+    """Folds a content line to 75 octets as RFC 5545 requires."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never split a multi-byte UTF-8 character.
+        while cut < len(encoded) and encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = 74
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def stream_assignments_ics(
+    assignments: Iterable[DutyAssignment],
+    calendar_name: str = "Дежурства",
+    dtstamp: datetime.datetime | None = None,
+) -> Iterator[str]:
+    """Yields an iCalendar document with one all-day VEVENT per assignment.
+
+    DTSTAMP is ``dtstamp`` when given, so the same data renders the same
+    bytes, and the current time otherwise.
+    """
+    stamp = (
+        (dtstamp or timezone.now()).astimezone(datetime.UTC).strftime("%Y%m%dT%H%M%SZ")
+    )
+    yield "BEGIN:VCALENDAR\r\n"
+    yield "VERSION:2.0\r\n"
+    yield "PRODID:-//duty-planner//RU\r\n"
+    yield "CALSCALE:GREGORIAN\r\n"
+    yield _ics_line(f"X-WR-CALNAME:{_ics_text(calendar_name)}")
+    for assignment in assignments:
+        date = assignment.duty.date
+        yield "".join(
+            (
+                "BEGIN:VEVENT\r\n",
+                f"UID:assignment-{assignment.id}@duty-planner\r\n",
+                f"DTSTAMP:{stamp}\r\n",
+                f"DTSTART;VALUE=DATE:{date:%Y%m%d}\r\n",
+                f"DTEND;VALUE=DATE:{date + datetime.timedelta(days=1):%Y%m%d}\r\n",
+                _ics_line(f"SUMMARY:{_ics_text('Дежурство: ' + str(assignment.user))}"),
+                "END:VEVENT\r\n",
+            )
+        )
+    yield "END:VCALENDAR\r\n"
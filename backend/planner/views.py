@@ -1,26 +1,55 @@
+import datetime
+import hashlib
 import logging
+from collections.abc import Callable
 
 from django.db import transaction
 from django.db.models import QuerySet
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBase,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from .models import Duty
 from .serializers import (
+    AssignQuerySerializer,
+    CompactQuerySerializer,
     DatesQuerySerializer,
     DaysOffBulkSerializer,
+    DaysOffImportSerializer,
     DaysOffSerializer,
+    DutyAssignmentBatchGenerateSerializer,
     DutyAssignmentChangeSerializer,
     DutyAssignmentGenerateSerializer,
     DutyAssignmentSerializer,
-    DutyIdsSerializer,
+    DutyBulkDeleteSerializer,
     DutyWithAssignmentsSerializer,
+    GenerateQuerySerializer,
+    GenerationJobSerializer,
+    ListAssignmentsQuerySerializer,
     StaffDutyStatsSerializer,
+    StaffPrioritySerializer,
     StaffSerializer,
+    serialize_duties,
+)
+from .services.assignments import CachedManageAssignments
+from .services.jobs import GenerationJobs
+from .services.planner import new_seed
+from .services.tracing import PlanTrace
+from .streaming import (
+    stream_assignments_csv,
+    stream_assignments_ics,
+    stream_json_data,
 )
-from .services.assignments import ManageAssignments
 
 logger = logging.getLogger(__name__)
 
@@ -28,14 +57,44 @@ logger = logging.getLogger(__name__)
 class BaseAssignmentViewSet(viewsets.ModelViewSet):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.assignments = ManageAssignments()
+        self.assignments = CachedManageAssignments()
 
     def get_permissions(self):
-        if self.action in ["list", "retrieve", "stats", "list_assignments"]:
+        if self.action in [
+            "list",
+            "retrieve",
+            "stats",
+            "list_assignments",
+            "export_csv",
+            "export_ics",
+            "calendar",
+        ]:
             return [AllowAny()]
         else:
             return [IsAuthenticated()]
 
+    def conditional_response(
+        self, request, stamp: tuple, build_response: Callable[[], HttpResponseBase]
+    ) -> HttpResponseBase:
+        """Answers 304 when the client's ETag matches the data version stamp.
+
+        Deleted rows do not move the newest ``updated_at``, so only the ETag
+        (which also covers row counts) decides; Last-Modified is informative.
+        """
+        etag = quote_etag(
+            hashlib.md5(
+                repr((request.get_full_path(), stamp)).encode(), usedforsecurity=False
+            ).hexdigest()
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = build_response()
+        response["ETag"] = etag
+        modified = [v for v in stamp if isinstance(v, datetime.datetime)]
+        if modified:
+            response["Last-Modified"] = http_date(max(modified).timestamp())
+        return response
+
 
 class StaffViewSet(BaseAssignmentViewSet):
     serializer_class = StaffSerializer
@@ -44,6 +103,28 @@ class StaffViewSet(BaseAssignmentViewSet):
         qs = self.assignments.get_all_staff()
         return qs
 
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request,
+            self.assignments.get_staff_stamp(),
+            lambda: Response(
+                self.get_serializer(self.assignments.get_staff_list(), many=True).data
+            ),
+        )
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self.assignments.invalidate_staff([serializer.instance.id])
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.assignments.invalidate_staff([serializer.instance.id])
+
+    def perform_destroy(self, instance):
+        user_id = instance.id
+        super().perform_destroy(instance)
+        self.assignments.invalidate_staff([user_id])
+
     @action(detail=False, methods=["get"])
     def stats(self, request):
         query_serializer = DatesQuerySerializer(data=request.query_params)
@@ -52,10 +133,39 @@ class StaffViewSet(BaseAssignmentViewSet):
         start_date = query_serializer.validated_data["start_date"]
         end_date = query_serializer.validated_data["end_date"]
 
-        stats = self.assignments.get_staff_duties(start_date, end_date)
-        serializer = StaffDutyStatsSerializer(data=stats, many=True)
-        serializer.is_valid(raise_exception=True)
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        def build_response():
+            stats = self.assignments.get_staff_duties(start_date, end_date)
+            serializer = StaffDutyStatsSerializer(data=stats, many=True)
+            serializer.is_valid(raise_exception=True)
+            return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+        return self.conditional_response(
+            request,
+            self.assignments.get_schedule_stamp(start_date, end_date),
+            build_response,
+        )
+
+    @action(detail=True, methods=["get"])
+    def calendar(self, request, pk=None) -> HttpResponseBase:
+        """Personal ICS feed of the staff member's duties.
+
+        The user's duties are cached per user and replaced only when their
+        assignments or their staff record change, so polling clients are
+        answered, including with 304, without touching the database. The
+        ETag follows the rendered data, not the time it was rendered.
+        """
+        if not str(pk).isdigit():
+            raise Http404
+        feed = self.assignments.get_user_calendar(int(pk))
+        if feed is None:
+            raise Http404
+        return self.conditional_response(
+            request,
+            (feed["digest"], feed["updated_at"]),
+            lambda: HttpResponse(
+                feed["body"], content_type="text/calendar; charset=utf-8"
+            ),
+        )
 
 
 class DaysOffViewSet(BaseAssignmentViewSet):
@@ -98,6 +208,18 @@ class DaysOffViewSet(BaseAssignmentViewSet):
         response_data = DaysOffSerializer(days_off, many=True).data
         return Response(response_data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_days_off(self, request) -> Response:
+        serializer = DaysOffImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        pairs = serializer.validated_data["pairs"]
+        self.assignments.import_days_off(pairs)
+        return Response(
+            {"created": len(pairs), "skipped": serializer.validated_data["skipped"]},
+            status=status.HTTP_201_CREATED,
+        )
+
 
 class DutyAssignmentViewSet(BaseAssignmentViewSet):
     serializer_class = DutyAssignmentSerializer
@@ -106,37 +228,196 @@ class DutyAssignmentViewSet(BaseAssignmentViewSet):
         qs = self.assignments.get_all_duty_assignments()
         return qs
 
+    def perform_create(self, serializer):
+        duty_assignment = serializer.save()
+        self.assignments.touch_duties([duty_assignment.duty_id])
+        self.assignments.on_assignments_changed([duty_assignment.user_id])
+
+    def perform_update(self, serializer):
+        prev_duty_id = serializer.instance.duty_id
+        prev_user_id = serializer.instance.user_id
+        duty_assignment = serializer.save()
+        self.assignments.touch_duties([prev_duty_id, duty_assignment.duty_id])
+        self.assignments.on_assignments_changed([prev_user_id, duty_assignment.user_id])
+
+    def perform_destroy(self, instance):
+        duty_id = instance.duty_id
+        instance.delete()
+        self.assignments.touch_duties([duty_id])
+        self.assignments.on_assignments_changed([instance.user_id])
+
     @action(detail=False, methods=["get"])
     def list_assignments(self, request) -> Response:
-        query_serializer = DatesQuerySerializer(data=request.query_params)
+        query_serializer = ListAssignmentsQuerySerializer(data=request.query_params)
         query_serializer.is_valid(raise_exception=True)
 
         start_date = query_serializer.validated_data["start_date"]
         end_date = query_serializer.validated_data["end_date"]
+        limit = query_serializer.validated_data.get("limit")
+        compact = query_serializer.validated_data["compact"]
+
+        def build_response():
+            if query_serializer.validated_data["stream"]:
+                duties = self.assignments.iter_duties_by_date(start_date, end_date)
+                return StreamingHttpResponse(
+                    stream_json_data(duties, DutyWithAssignmentsSerializer),
+                    content_type="application/json",
+                )
+
+            if limit is not None:
+                duties, next_cursor = self.assignments.get_duties_page(
+                    start_date,
+                    end_date,
+                    limit,
+                    cursor=query_serializer.validated_data.get("cursor"),
+                )
+                data = serialize_duties(duties, compact)
+                data["next_cursor"] = next_cursor
+                return Response(data, status=status.HTTP_200_OK)
 
-        duties = self.assignments.get_duties_by_date(start_date, end_date)
-        serializer = DutyWithAssignmentsSerializer(duties, many=True)
-        return Response({"data": serializer.data}, status=status.HTTP_200_OK)
+            duties = self.assignments.get_duties_by_date(start_date, end_date)
+            return Response(
+                serialize_duties(duties, compact), status=status.HTTP_200_OK
+            )
+
+        return self.conditional_response(
+            request,
+            self.assignments.get_schedule_stamp(start_date, end_date),
+            build_response,
+        )
+
+    def export_response(
+        self, request, render: Callable, content_type: str, extension: str
+    ) -> HttpResponseBase:
+        query_serializer = DatesQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        start_date = query_serializer.validated_data["start_date"]
+        end_date = query_serializer.validated_data["end_date"]
+
+        def build_response():
+            assignments = self.assignments.iter_duty_assignments(start_date, end_date)
+            response = StreamingHttpResponse(
+                render(assignments), content_type=content_type
+            )
+            response["Content-Disposition"] = (
+                f'attachment; filename="duties_{start_date}_{end_date}.{extension}"'
+            )
+            return response
+
+        return self.conditional_response(
+            request,
+            self.assignments.get_schedule_stamp(start_date, end_date),
+            build_response,
+        )
+
+    @action(detail=False, methods=["get"], url_path="export/csv")
+    def export_csv(self, request) -> HttpResponseBase:
+        return self.export_response(
+            request, stream_assignments_csv, "text/csv; charset=utf-8", "csv"
+        )
+
+    @action(detail=False, methods=["get"], url_path="export/ics")
+    def export_ics(self, request) -> HttpResponseBase:
+        return self.export_response(
+            request, stream_assignments_ics, "text/calendar; charset=utf-8", "ics"
+        )
 
     @action(detail=False, methods=["post"])
     def generate(self, request) -> Response:
         parameters_serializer = DutyAssignmentGenerateSerializer(data=request.data)
         parameters_serializer.is_valid(raise_exception=True)
+        query_serializer = GenerateQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
 
         people_per_day = parameters_serializer.validated_data["people_per_day"]
         serialized_dates = parameters_serializer.validated_data["dates"]
+        solver = parameters_serializer.validated_data["solver"]
+        seed = parameters_serializer.validated_data.get("seed")
+        if seed is None:
+            seed = new_seed()
+
+        replan = parameters_serializer.validated_data["replan"]
+        if parameters_serializer.validated_data["background"]:
+            job = GenerationJobs(self.assignments).submit(
+                serialized_dates, people_per_day, solver, seed, replan=replan
+            )
+            return Response(
+                {"job_id": job.id, "status": job.status, "seed": seed},
+                status=status.HTTP_202_ACCEPTED,
+            )
 
-        dates = self.assignments.create_duty_days(serialized_dates)
+        created_dates = None
+        if not replan:
+            created_dates = self.assignments.upsert_duty_days(serialized_dates)[
+                "created"
+            ]
+        dates = sorted(serialized_dates)
         start_date, end_date = self.assignments.get_date_range(dates)
+        trace = (
+            PlanTrace(enabled=True)
+            if query_serializer.validated_data["trace"]
+            else None
+        )
 
         try:
             with transaction.atomic():
-                errors = self.assignments.create_plan(
-                    start_date, end_date, people_per_day
-                )
+                if replan:
+                    errors = self.assignments.replan(
+                        start_date, end_date, people_per_day, seed=seed, trace=trace
+                    )
+                else:
+                    errors = self.assignments.create_plan(
+                        start_date,
+                        end_date,
+                        people_per_day,
+                        solver=solver,
+                        seed=seed,
+                        trace=trace,
+                    )
                 duties = self.assignments.get_duties_by_date(start_date, end_date)
-                serializer = DutyWithAssignmentsSerializer(duties, many=True)
-                data = {"errors": errors, "data": serializer.data}
+                data = serialize_duties(
+                    duties, query_serializer.validated_data["compact"]
+                )
+                data.update(errors=errors, seed=seed)
+                if created_dates is not None:
+                    data["created_dates"] = created_dates
+                if trace is not None:
+                    data.update(trace_id=trace.trace_id, trace=trace.events)
+                return Response(data, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response(
+                data={"error": "Не удалось сгенерировать расписание: " + str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @action(detail=False, methods=["post"])
+    def generate_batch(self, request) -> Response:
+        parameters_serializer = DutyAssignmentBatchGenerateSerializer(data=request.data)
+        parameters_serializer.is_valid(raise_exception=True)
+        query_serializer = CompactQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+
+        ranges = parameters_serializer.validated_data["ranges"]
+        seed = parameters_serializer.validated_data.get("seed")
+        if seed is None:
+            seed = new_seed()
+
+        try:
+            with transaction.atomic():
+                errors = self.assignments.create_plans(
+                    ranges,
+                    parameters_serializer.validated_data["people_per_day"],
+                    solver=parameters_serializer.validated_data["solver"],
+                    seed=seed,
+                )
+                duties = self.assignments.get_duties_by_date(
+                    min(min(dates) for dates in ranges),
+                    max(max(dates) for dates in ranges),
+                )
+                data = serialize_duties(
+                    duties, query_serializer.validated_data["compact"]
+                )
+                data.update(errors=errors, seed=seed)
                 return Response(data, status=status.HTTP_200_OK)
         except Exception as e:
             return Response(
@@ -149,23 +430,36 @@ class DutyAssignmentViewSet(BaseAssignmentViewSet):
         duty_assignment_serializer = DutyAssignmentChangeSerializer(data=request.data)
         duty_assignment_serializer.is_valid(raise_exception=True)
 
-        query_serializer = DatesQuerySerializer(data=request.query_params)
+        query_serializer = AssignQuerySerializer(data=request.query_params)
         query_serializer.is_valid(raise_exception=True)
 
         prev_user = duty_assignment_serializer.validated_data["user_id_prev"]
         new_user = duty_assignment_serializer.validated_data["user_id_new"]
         date = duty_assignment_serializer.validated_data["date"]
-        start_date = query_serializer.validated_data["start_date"]
-        end_date = query_serializer.validated_data["end_date"]
 
         try:
             with transaction.atomic():
                 logger.info("make assignment")
                 self.assignments.make_assignment(date, prev_user, new_user)
+                if query_serializer.validated_data["delta"]:
+                    duty, staff = self.assignments.get_assignment_delta(
+                        date, [u for u in (prev_user, new_user) if u is not None]
+                    )
+                    data = {
+                        "duty": DutyWithAssignmentsSerializer(duty).data,
+                        "staff": StaffPrioritySerializer(staff, many=True).data,
+                        "version": duty.updated_at if duty else None,
+                    }
+                    return Response(data, status=status.HTTP_200_OK)
                 logger.info("получаем duty")
-                duties = self.assignments.get_duties_by_date(start_date, end_date)
-                serializer = DutyWithAssignmentsSerializer(duties, many=True)
-                return Response({"data": serializer.data}, status=status.HTTP_200_OK)
+                duties = self.assignments.get_duties_by_date(
+                    query_serializer.validated_data["start_date"],
+                    query_serializer.validated_data["end_date"],
+                )
+                data = serialize_duties(
+                    duties, query_serializer.validated_data["compact"]
+                )
+                return Response(data, status=status.HTTP_200_OK)
         except Exception as e:
             return Response(
                 {"error": f"Не удалось переназначить: {str(e)}"},
@@ -175,12 +469,30 @@ class DutyAssignmentViewSet(BaseAssignmentViewSet):
     @action(detail=False, methods=["post"])
     def bulk_delete(self, request):
         logger.info("request.data: %s", request.data)
-        duty_ids_serializer = DutyIdsSerializer(data=request.data)
-        duty_ids_serializer.is_valid(raise_exception=True)
+        serializer = DutyBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         logger.info("delete duty")
-        deleted_duty_count = self.assignments.bulk_delete_duties_by_id(
-            duty_ids_serializer.validated_data["duty_ids"]
-        )
+        if "duty_ids" in serializer.validated_data:
+            deleted = self.assignments.delete_duties_by_id(
+                serializer.validated_data["duty_ids"]
+            )
+        else:
+            deleted = self.assignments.delete_duties_in_range(
+                serializer.validated_data["start_date"],
+                serializer.validated_data["end_date"],
+            )
         return Response(
-            {"deleted_duty_count": deleted_duty_count}, status=status.HTTP_200_OK
+            {
+                "deleted_duty_count": deleted.get(Duty._meta.label),
+                "deleted": deleted,
+            },
+            status=status.HTTP_200_OK,
         )
+
+
+class GenerationJobViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = GenerationJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self) -> QuerySet:
+        return GenerationJobs().get_all()
@@ -32,6 +32,16 @@ from django.utils import timezone
 from planner.models import Staff, DaysOff, Duty, DutyAssignment
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Очищает кэш между тестами"""
+    from django.core.cache import cache
+
+    cache.clear()
+    yield
+    cache.clear()
+
+
 @pytest.fixture
 def api_client():
     """Клиент для API запросов"""
@@ -179,11 +189,20 @@ def duty_with_assignments(db, staff_users, duty_day):
 
 
 @pytest.fixture
-def authenticated_client(api_client, staff_user):
+def account_user(db):
+    """Создает учетную запись для входа в API"""
+    from django.contrib.auth import get_user_model
+
+    return get_user_model().objects.create_user(
+        email="admin@example.com", password="password"
+    )
+
+
+@pytest.fixture
+def authenticated_client(api_client, account_user):
     """
     API клиент с аутентифицированным пользователем.
-    Используйте если у вас есть authentication в API.
+    Используйте для эндпоинтов, требующих авторизации.
     """
-    # Раскомментируйте и настройте если используете authentication:
-    # api_client.force_authenticate(user=staff_user)
+    api_client.force_authenticate(user=account_user)
     return api_client
@@ -0,0 +1,72 @@
+"""
+Synthetic data generators for planner benchmarks
+"""
+
+import random
+from datetime import date, timedelta
+
+from planner.models import DaysOff, Duty, DutyAssignment, Staff
+
+
+def make_staff(count, rng, max_priority=3):
+    """Creates `count` staff members with random priorities"""
+    return Staff.objects.bulk_create(
+        Staff(
+            first_name=f"Staff{i}",
+            last_name="Bench",
+            email=f"staff{i}@bench.example.com",
+            priority=rng.randrange(max_priority),
+        )
+        for i in range(count)
+    )
+
+
+def make_duties(start_date, count):
+    """Creates `count` consecutive duty days starting at `start_date`"""
+    return Duty.objects.bulk_create(
+        Duty(date=start_date + timedelta(days=i)) for i in range(count)
+    )
+
+
+def make_days_off(staff, duties, density, rng):
+    """Gives every staff member a day off on each duty date with `density` chance"""
+    return DaysOff.objects.bulk_create(
+        DaysOff(user=user, date=duty.date)
+        for user in staff
+        for duty in duties
+        if rng.random() < density
+    )
+
+
+def make_assignments(staff, duties, per_duty, rng):
+    """Pre-assigns `per_duty` random staff members to every duty"""
+    per_duty = min(per_duty, len(staff))
+    return DutyAssignment.objects.bulk_create(
+        DutyAssignment(user=user, duty=duty)
+        for duty in duties
+        for user in rng.sample(staff, per_duty)
+    )
+
+
+def make_dataset(
+    staff_count,
+    duty_count,
+    days_off_density=0.1,
+    assigned_per_duty=0,
+    start_date=date(2030, 1, 1),
+    seed=0,
+):
+    """Creates a complete planner dataset and returns its parts"""
+    rng = random.Random(seed)
+    staff = make_staff(staff_count, rng)
+    duties = make_duties(start_date, duty_count)
+    days_off = make_days_off(staff, duties, days_off_density, rng)
+    assignments = make_assignments(staff, duties, assigned_per_duty, rng)
+    return {
+        "staff": staff,
+        "duties": duties,
+        "days_off": days_off,
+        "assignments": assignments,
+        "start": duties[0].date,
+        "end": duties[-1].date,
+    }
@@ -0,0 +1,92 @@
+"""
+Benchmarks for plan generation (run with `make benchmark` or `pytest -m benchmark`)
+"""
+
+import time
+import tracemalloc
+
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from planner.services.assignments import ManageAssignments
+
+from .generators import make_dataset
+
+STAFF_SIZES = [10, 100, 1000]
+DUTY_SIZES = [7, 31, 92]
+DAYS_OFF_DENSITY = 0.1
+ASSIGNED_PER_DUTY = 1
+PEOPLE_PER_DAY = 2
+# Plan generation must not issue queries per staff member or per duty.
+QUERY_BUDGET = 20
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.slow]
+
+
+@pytest.fixture(scope="module")
+def benchmark_report(request):
+    """Collects benchmark rows and prints them as a table at the end"""
+    rows = []
+    yield rows
+    reporter = request.config.pluginmanager.get_plugin("terminalreporter")
+    capture = request.config.pluginmanager.get_plugin("capturemanager")
+    if reporter is None or capture is None or not rows:
+        return
+    with capture.global_and_fixture_disabled():
+        reporter.write_line("")
+        reporter.write_line(
+            f"{'solver':>8} {'staff':>6} {'days':>5} {'time, s':>9} "
+            f"{'queries':>8} {'peak, KiB':>10}"
+        )
+        for row in rows:
+            reporter.write_line(
+                f"{row['solver']:>8} {row['staff']:>6} {row['days']:>5} "
+                f"{row['time']:>9.3f} {row['queries']:>8} "
+                f"{row['peak'] / 1024:>10.0f}"
+            )
+
+
+def run_plan(dataset, solver):
+    return ManageAssignments().create_plan(
+        dataset["start"], dataset["end"], PEOPLE_PER_DAY, solver=solver, seed=0
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("solver", ["greedy", "flow"])
+@pytest.mark.parametrize("duty_count", DUTY_SIZES)
+@pytest.mark.parametrize("staff_count", STAFF_SIZES)
+def test_create_plan_scaling(benchmark_report, staff_count, duty_count, solver):
+    """Measures wall time, query count and peak memory of create_plan"""
+    dataset = make_dataset(
+        staff_count,
+        duty_count,
+        days_off_density=DAYS_OFF_DENSITY,
+        assigned_per_duty=ASSIGNED_PER_DUTY,
+    )
+
+    # Memory tracing slows the run down, so it is measured on a rolled back
+    # copy of the same generation.
+    with transaction.atomic():
+        tracemalloc.start()
+        run_plan(dataset, solver)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        transaction.set_rollback(True)
+
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        run_plan(dataset, solver)
+        elapsed = time.perf_counter() - started
+
+    benchmark_report.append(
+        {
+            "solver": solver,
+            "staff": staff_count,
+            "days": duty_count,
+            "time": elapsed,
+            "queries": len(ctx.captured_queries),
+            "peak": peak,
+        }
+    )
+    assert len(ctx.captured_queries) <= QUERY_BUDGET
@@ -0,0 +1,308 @@
+"""
+Tests for the schedule read-through cache
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from django.db import transaction
+from planner.models import Duty, DutyAssignment
+from planner.services.assignments import CachedManageAssignments
+from planner.services.cache import ScheduleCache, month_scopes
+
+
+@pytest.fixture
+def service(db):
+    return CachedManageAssignments()
+
+
+def test_month_scopes_cross_year():
+    assert month_scopes(date(2030, 11, 15), date(2031, 2, 1)) == [
+        "month:2030-11",
+        "month:2030-12",
+        "month:2031-01",
+        "month:2031-02",
+    ]
+
+
+@pytest.mark.django_db
+class TestScheduleCache:
+    """Tests for ScheduleCache"""
+
+    def test_get_or_load_caches_value(self):
+        cache = ScheduleCache()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return [1, 2]
+
+        assert cache.get_or_load("test", (1,), ["month:2030-01"], loader) == [1, 2]
+        assert cache.get_or_load("test", (1,), ["month:2030-01"], loader) == [1, 2]
+        assert len(calls) == 1
+
+    def test_invalidate_only_touched_scopes(self):
+        cache = ScheduleCache()
+        calls = []
+
+        def load(name, scope):
+            return cache.get_or_load(name, (), [scope], lambda: calls.append(name))
+
+        load("january", "month:2030-01")
+        load("february", "month:2030-02")
+        ScheduleCache().invalidate(["month:2030-01"])
+        load("january", "month:2030-01")
+        load("february", "month:2030-02")
+
+        assert calls == ["january", "february", "january"]
+
+    def test_bypassed_after_write_in_transaction(self):
+        cache = ScheduleCache()
+        calls = []
+
+        with transaction.atomic():
+            cache.invalidate(["month:2030-01"])
+            cache.get_or_load("test", (), ["month:2030-01"], lambda: calls.append(1))
+            cache.get_or_load("test", (), ["month:2030-01"], lambda: calls.append(1))
+
+        assert cache.dirty
+        assert len(calls) == 2
+
+    def test_file_based_backend(self, settings, tmp_path):
+        settings.CACHES = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "files": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": str(tmp_path),
+            },
+        }
+        cache = ScheduleCache(alias="files")
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return {"user": 1}
+
+        cache.get_or_load("test", (), ["month:2030-01"], loader)
+        assert cache.get_or_load("test", (), ["month:2030-01"], loader) == {"user": 1}
+        assert len(calls) == 1
+
+
+@pytest.mark.django_db
+class TestCachedManageAssignments:
+    """Tests for CachedManageAssignments"""
+
+    def test_get_duties_by_date_served_from_cache(
+        self, service, duty_assignments, date_range, django_assert_num_queries
+    ):
+        first = service.get_duties_by_date(date_range["start"], date_range["end"])
+
+        with django_assert_num_queries(0):
+            second = CachedManageAssignments().get_duties_by_date(
+                date_range["start"], date_range["end"]
+            )
+
+        assert [d.id for d in second] == [d.id for d in first]
+        assert [u.id for u in second[0].dutyassignment_set.all()] == [
+            u.id for u in first[0].dutyassignment_set.all()
+        ]
+
+    def test_create_assignment_invalidates_month(
+        self, service, staff_users, duty_days, date_range
+    ):
+        service.get_duties_by_date(date_range["start"], date_range["end"])
+
+        CachedManageAssignments().create_assignment(
+            duty_days[0].date, staff_users[0].id
+        )
+        duties = CachedManageAssignments().get_duties_by_date(
+            date_range["start"], date_range["end"]
+        )
+
+        duty = next(d for d in duties if d.id == duty_days[0].id)
+        assert [a.user_id for a in duty.dutyassignment_set.all()] == [staff_users[0].id]
+
+    def test_write_keeps_other_months_cached(
+        self, service, staff_user, django_assert_num_queries
+    ):
+        january = Duty.objects.create(date=date(2030, 1, 10))
+        Duty.objects.create(date=date(2030, 3, 10))
+        service.get_duties_by_date(date(2030, 3, 1), date(2030, 3, 31))
+
+        CachedManageAssignments().create_assignment(january.date, staff_user.id)
+
+        with django_assert_num_queries(0):
+            CachedManageAssignments().get_duties_by_date(
+                date(2030, 3, 1), date(2030, 3, 31)
+            )
+
+    def test_existing_duty_days_keep_cache(
+        self, service, duty_days, date_range, django_assert_num_queries
+    ):
+        service.get_duties_by_date(date_range["start"], date_range["end"])
+
+        CachedManageAssignments().create_duty_days([d.date for d in duty_days])
+
+        with django_assert_num_queries(0):
+            CachedManageAssignments().get_duties_by_date(
+                date_range["start"], date_range["end"]
+            )
+
+    def test_bulk_delete_invalidates_month(self, service, duty_days, date_range):
+        service.get_duties_by_date(date_range["start"], date_range["end"])
+
+        CachedManageAssignments().delete_duties_by_id([duty_days[0].id])
+
+        duties = CachedManageAssignments().get_duties_by_date(
+            date_range["start"], date_range["end"]
+        )
+        assert duty_days[0].id not in {d.id for d in duties}
+
+    def test_create_plan_invalidates_stats(
+        self, service, staff_users, duty_days, date_range
+    ):
+        assert service.get_staff_duties(date_range["start"], date_range["end"]) == []
+
+        CachedManageAssignments().create_plan(
+            date_range["start"], date_range["end"], 1, seed=0
+        )
+
+        stats = CachedManageAssignments().get_staff_duties(
+            date_range["start"], date_range["end"]
+        )
+        assert (
+            sum(month["duty_count"] for row in stats for month in row["duties"])
+            == DutyAssignment.objects.count()
+        )
+
+    def test_staff_list_invalidated_by_staff_edit(
+        self, authenticated_client, staff_user
+    ):
+        authenticated_client.get("/api/users/")
+
+        authenticated_client.patch(
+            f"/api/users/{staff_user.id}/", {"first_name": "Пётр"}, format="json"
+        )
+        response = authenticated_client.get("/api/users/")
+
+        assert response.data[0]["first_name"] == "Пётр"
+
+    def test_staff_delete_invalidates_duties(
+        self, authenticated_client, duty_assignment, tomorrow
+    ):
+        params = {"start_date": tomorrow, "end_date": tomorrow + timedelta(days=1)}
+        authenticated_client.get("/api/duties/list_assignments/", params)
+
+        authenticated_client.delete(f"/api/users/{duty_assignment.user_id}/")
+        response = authenticated_client.get("/api/duties/list_assignments/", params)
+
+        assert response.data["data"][0]["users"] == []
+
+    def test_user_calendar_served_from_cache(
+        self, service, duty_assignments, django_assert_num_queries
+    ):
+        user_id = duty_assignments[0].user_id
+        first = service.get_user_calendar(user_id)
+
+        with django_assert_num_queries(0):
+            second = CachedManageAssignments().get_user_calendar(user_id)
+
+        assert second == first
+        assert first["body"].count("BEGIN:VEVENT") == 1
+
+    def test_user_calendar_invalidated_for_changed_user_only(
+        self, service, staff_users, duty_days, django_assert_num_queries
+    ):
+        changed, other = staff_users[0].id, staff_users[1].id
+        service.get_user_calendar(changed)
+        service.get_user_calendar(other)
+
+        CachedManageAssignments().create_assignment(duty_days[0].date, changed)
+
+        calendar = CachedManageAssignments().get_user_calendar(changed)
+        assert calendar["body"].count("BEGIN:VEVENT") == 1
+        with django_assert_num_queries(0):
+            CachedManageAssignments().get_user_calendar(other)
+
+    def test_user_calendar_kept_without_timeout(
+        self, duty_assignments, django_assert_num_queries
+    ):
+        service = CachedManageAssignments(ScheduleCache(timeout=0))
+        user_id = duty_assignments[0].user_id
+        service.get_user_calendar(user_id)
+
+        with django_assert_num_queries(0):
+            service.get_user_calendar(user_id)
+
+    def test_user_calendar_entry_independent_of_start_date(
+        self, service, duty_assignments, django_assert_num_queries
+    ):
+        assignment = duty_assignments[0]
+        service.get_user_calendar(assignment.user_id)
+
+        with django_assert_num_queries(0):
+            later = CachedManageAssignments().get_user_calendar(
+                assignment.user_id, assignment.duty.date + timedelta(days=1)
+            )
+
+        assert "BEGIN:VEVENT" not in later["body"]
+
+    def test_user_calendar_invalidated_by_staff_edit(
+        self, service, staff_users, authenticated_client, django_assert_num_queries
+    ):
+        changed, other = staff_users[0], staff_users[1]
+        service.get_user_calendar(changed.id)
+        service.get_user_calendar(other.id)
+
+        authenticated_client.patch(
+            f"/api/users/{changed.id}/", {"first_name": "Пётр"}, format="json"
+        )
+
+        calendar = CachedManageAssignments().get_user_calendar(changed.id)
+        assert "Пётр" in calendar["body"]
+        with django_assert_num_queries(0):
+            CachedManageAssignments().get_user_calendar(other.id)
+
+    def test_create_plan_invalidates_assigned_calendars(
+        self, service, staff_users, duty_days, date_range
+    ):
+        calendars = {
+            user.id: service.get_user_calendar(user.id) for user in staff_users
+        }
+
+        CachedManageAssignments().create_plan(
+            date_range["start"], date_range["end"], 1, seed=0
+        )
+
+        for user in staff_users:
+            events = (
+                CachedManageAssignments()
+                .get_user_calendar(user.id)["body"]
+                .count("BEGIN:VEVENT")
+            )
+            assert events == DutyAssignment.objects.filter(user=user).count()
+            if events:
+                assert calendars[user.id]["body"].count("BEGIN:VEVENT") == 0
+
+    def test_range_delete_invalidates_month(self, service, duty_days, date_range):
+        service.get_duties_by_date(date_range["start"], date_range["end"])
+
+        CachedManageAssignments().delete_duties_in_range(
+            date_range["start"], date_range["end"]
+        )
+
+        assert (
+            CachedManageAssignments().get_duties_by_date(
+                date_range["start"], date_range["end"]
+            )
+            == []
+        )
+
+    def test_bulk_delete_invalidates_calendars(self, service, duty_assignments):
+        user_id = duty_assignments[0].user_id
+        service.get_user_calendar(user_id)
+
+        CachedManageAssignments().delete_duties_by_id([duty_assignments[0].duty_id])
+
+        calendar = CachedManageAssignments().get_user_calendar(user_id)
+        assert "BEGIN:VEVENT" not in calendar["body"]
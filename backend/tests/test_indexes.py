@@ -0,0 +1,112 @@
+"""
+Index usage of the planner's hot queries.
+
+Each repository query is EXPLAINed over a seeded multi-year dataset and must
+be answered with index searches, never a full table scan, so range reads stay
+flat as history grows. On PostgreSQL sequential scans are disabled for the
+check, otherwise the planner may prefer them on a dataset this small.
+"""
+
+from datetime import date
+
+import pytest
+from django.db import connection, transaction
+from planner.services.repositories.days_off_repository import DaysOffRepository
+from planner.services.repositories.duty_assignment_repository import (
+    DutyAssignmentRepository,
+)
+from planner.services.repositories.duty_repository import DutyRepository
+from planner.services.repositories.staff_month_stats_repository import (
+    StaffMonthStatsRepository,
+)
+
+from .generators import make_dataset
+
+START = date(2030, 3, 1)
+END = date(2030, 3, 31)
+
+
+def explain(qs) -> str:
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        return qs.explain()
+
+
+def full_scans(plan: str) -> list[str]:
+    if connection.vendor == "postgresql":
+        return [line for line in plan.splitlines() if "Seq Scan" in line]
+    return [
+        line
+        for line in plan.splitlines()
+        if " SCAN " in f" {line} " and "INDEX" not in line
+    ]
+
+
+@pytest.fixture
+def history(db):
+    """Two years of duties with days off and assignments"""
+    return make_dataset(20, 730, days_off_density=0.1, assigned_per_duty=2)
+
+
+@pytest.mark.django_db
+class TestIndexUsage:
+    """Tests that repository queries use index scans"""
+
+    @pytest.mark.parametrize(
+        "query, index",
+        [
+            (
+                lambda h: DaysOffRepository().get_user_date_pairs(START, END),
+                "daysoff_date_user_idx",
+            ),
+            (
+                lambda h: DaysOffRepository().get_list_of_days_off(START, END),
+                "daysoff_date_user_idx",
+            ),
+            (
+                lambda h: DutyAssignmentRepository().get_user_duty_pairs(
+                    [duty.id for duty in h["duties"][59:90]]
+                ),
+                "assignment_duty_user_idx",
+            ),
+            (
+                lambda h: DutyAssignmentRepository().get_duty_stats(START, END),
+                "assignment_duty_user_idx",
+            ),
+            (
+                lambda h: DutyAssignmentRepository().get_list_of_duty_assignment(
+                    START, END
+                ),
+                "assignment_duty_user_idx",
+            ),
+            (
+                lambda h: StaffMonthStatsRepository().get_duty_stats(START, END),
+                None,
+            ),
+            (lambda h: DutyRepository().get_id_date_pairs(START, END), None),
+            (
+                lambda h: DutyAssignmentRepository().get_user_assignments(
+                    h["staff"][0].id, START
+                ),
+                None,
+            ),
+        ],
+        ids=[
+            "days-off-pairs",
+            "days-off-range",
+            "assignments-by-duty",
+            "raw-stats",
+            "assignments-range",
+            "rollup-stats",
+            "duties-range",
+            "assignments-by-user",
+        ],
+    )
+    def test_query_uses_index(self, history, query, index):
+        plan = explain(query(history))
+
+        assert not full_scans(plan), plan
+        if index is not None:
+            assert index in plan, plan
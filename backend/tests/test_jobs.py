@@ -0,0 +1,139 @@
+"""
+Tests for background plan generation jobs
+"""
+
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from planner.models import DutyAssignment, GenerationJob
+from planner.services.jobs import GenerationJobs
+from rest_framework import status
+
+
+@pytest.fixture
+def jobs(db):
+    return GenerationJobs()
+
+
+@pytest.mark.django_db
+class TestGenerationJobs:
+    """Tests for GenerationJobs service"""
+
+    def test_run_pending_generates_plan(self, jobs, staff_users, date_range):
+        job = jobs.submit(date_range["dates"], 2, "greedy", seed=0)
+
+        assert jobs.run_pending() == 1
+
+        job.refresh_from_db()
+        assert job.status == GenerationJob.Status.DONE
+        assert job.errors == {}
+        assert job.progress_done == job.progress_total == len(date_range["dates"])
+        assert job.started_at is not None and job.finished_at is not None
+        assert DutyAssignment.objects.count() == 2 * len(date_range["dates"])
+
+    def test_jobs_run_in_submission_order(self, jobs, staff_users, date_range):
+        first = jobs.submit(date_range["dates"][:1], 1, "greedy", seed=0)
+        second = jobs.submit(date_range["dates"][1:2], 1, "greedy", seed=0)
+
+        claimed = jobs.job_repo.claim_next()
+
+        assert claimed.id == first.id
+        assert claimed.status == GenerationJob.Status.RUNNING
+        assert jobs.job_repo.claim_next().id == second.id
+        assert jobs.job_repo.claim_next() is None
+
+    def test_progress_is_reported_per_duty(self, jobs, staff_users, date_range):
+        jobs.submit(date_range["dates"], 1, "flow", seed=0)
+        seen = []
+        jobs.job_repo.update_progress = lambda job_id, done, total: seen.append(
+            (done, total)
+        )
+
+        jobs.run(jobs.job_repo.claim_next())
+
+        total = len(date_range["dates"])
+        assert seen[0] == (1, total)
+        assert seen[-1] == (total, total)
+
+    def test_failed_job_records_error(self, jobs, date_range):
+        job = jobs.submit(date_range["dates"], 1, "unknown", seed=0)
+
+        jobs.run_pending()
+
+        job.refresh_from_db()
+        assert job.status == GenerationJob.Status.FAILED
+        assert "unknown" in job.error
+
+    def test_stale_running_job_is_failed(self, jobs, staff_users, date_range, settings):
+        settings.PLANNER_JOB_TIMEOUT = 60
+        stale = jobs.submit(date_range["dates"][:1], 1, "greedy", seed=0)
+        running = jobs.submit(date_range["dates"][1:2], 1, "greedy", seed=0)
+        jobs.job_repo.claim_next()
+        jobs.job_repo.claim_next()
+        GenerationJob.objects.filter(id=stale.id).update(
+            started_at=timezone.now() - timedelta(seconds=61)
+        )
+
+        assert jobs.run_pending() == 0
+
+        stale.refresh_from_db()
+        running.refresh_from_db()
+        assert stale.status == GenerationJob.Status.FAILED
+        assert stale.error and stale.finished_at is not None
+        assert running.status == GenerationJob.Status.RUNNING
+
+    def test_worker_command_once(self, jobs, staff_users, date_range):
+        jobs.submit(date_range["dates"], 1, "greedy", seed=0)
+        out = StringIO()
+
+        call_command("run_generation_worker", "--once", stdout=out)
+
+        assert "Processed 1" in out.getvalue()
+        assert GenerationJob.objects.get().status == GenerationJob.Status.DONE
+
+
+@pytest.mark.django_db
+class TestGenerationJobViews:
+    """Tests for background generate and job status endpoints"""
+
+    def test_generate_in_background(
+        self, authenticated_client, staff_users, date_range
+    ):
+        data = {
+            "dates": [d.isoformat() for d in date_range["dates"]],
+            "people_per_day": 2,
+            "seed": 7,
+            "background": True,
+        }
+
+        response = authenticated_client.post(
+            "/api/duties/generate/", data, format="json"
+        )
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data["status"] == GenerationJob.Status.PENDING
+        assert response.data["seed"] == 7
+        assert not DutyAssignment.objects.exists()
+
+        GenerationJobs().run_pending()
+        response = authenticated_client.get(
+            f"/api/generation-jobs/{response.data['job_id']}/"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["status"] == GenerationJob.Status.DONE
+        assert response.data["progress"] == {
+            "done": len(date_range["dates"]),
+            "total": len(date_range["dates"]),
+        }
+        assert response.data["errors"] == {}
+
+    def test_job_status_requires_authentication(self, api_client, jobs, date_range):
+        job = jobs.submit(date_range["dates"], 1, "greedy", seed=0)
+
+        response = api_client.get(f"/api/generation-jobs/{job.id}/")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -2,10 +2,15 @@
 Tests for ManageAssignments service
 """
 
+import logging
+
 import pytest
-from datetime import timedelta
+from datetime import date, timedelta
+from io import StringIO
+from django.contrib import admin
+from django.core.management import call_command
 from planner.services.assignments import ManageAssignments
-from planner.models import DutyAssignment, DaysOff, Duty, Staff
+from planner.models import DutyAssignment, DaysOff, Duty, Staff, StaffMonthStats
 
 
 @pytest.mark.django_db
@@ -27,6 +32,27 @@ class TestManageAssignments:
         result = service.get_duties_by_date(date_range["start"], date_range["end"])
         assert result.count() == len(duty_days)
 
+    def test_get_duties_page(self, service, duty_days, date_range):
+        """Test getting a page of duties and the cursor of the next one"""
+        duties, next_cursor = service.get_duties_page(
+            date_range["start"], date_range["end"], limit=5
+        )
+        assert [d.id for d in duties] == [d.id for d in duty_days[:5]]
+        assert next_cursor == duty_days[4].date
+
+        duties, next_cursor = service.get_duties_page(
+            date_range["start"], date_range["end"], limit=5, cursor=next_cursor
+        )
+        assert [d.id for d in duties] == [d.id for d in duty_days[5:]]
+        assert next_cursor is None
+
+    def test_iter_duties_by_date(self, service, duty_days, date_range):
+        """Test iterating duties of a range in chunks"""
+        result = service.iter_duties_by_date(
+            date_range["start"], date_range["end"], chunk_size=2
+        )
+        assert [d.id for d in result] == [d.id for d in duty_days]
+
     def test_create_duty_days(self, service, date_range):
         """Test creating duty days"""
         dates = date_range["dates"]
@@ -34,6 +60,14 @@ class TestManageAssignments:
 
         assert len(result) == len(dates)
 
+    def test_upsert_duty_days(self, service, duty_day, tomorrow):
+        """Test upsert reports created and existing duty days"""
+        day_after = tomorrow + timedelta(days=1)
+
+        result = service.upsert_duty_days([day_after, tomorrow])
+
+        assert result == {"created": [day_after], "existing": [tomorrow]}
+
     def test_get_duty_assignments_single_date(
         self, service, duty_assignments, date_range
     ):
@@ -147,19 +181,17 @@ class TestManageAssignments:
         duty_assignment.refresh_from_db()
         assert duty_assignment.user.id == new_user.id
 
-    def test_bulk_delete_duties_by_id(self, service, duty_days):
+    def test_delete_duties_by_id(self, service, duty_days):
         """Test bulk delete returns correct count and removes duties from DB"""
         ids = [duty_days[0].id, duty_days[1].id]
         initial_count = Duty.objects.count()
 
-        deleted = service.bulk_delete_duties_by_id(ids)
+        deleted = service.delete_duties_by_id(ids)
 
-        assert deleted == len(ids)
+        assert deleted[Duty._meta.label] == len(ids)
         assert Duty.objects.count() == initial_count - len(ids)
 
-    def test_bulk_delete_duties_by_id_cascade(
-        self, service, duty_assignments, duty_days
-    ):
+    def test_delete_duties_by_id_cascade(self, service, duty_assignments, duty_days):
         """Test that deleting duties cascade-removes their DutyAssignments"""
         ids = [duty_days[0].id]
         assignment_count_before = DutyAssignment.objects.count()
@@ -167,20 +199,20 @@ class TestManageAssignments:
         assignments_for_duty = DutyAssignment.objects.filter(
             duty_id=duty_days[0].id
         ).count()
-        service.bulk_delete_duties_by_id(ids)
+        service.delete_duties_by_id(ids)
 
         assert (
             DutyAssignment.objects.count()
             == assignment_count_before - assignments_for_duty
         )
 
-    def test_bulk_delete_duties_by_id_empty(self, service, duty_days):
-        """Test bulk delete with empty list returns None and leaves DB unchanged"""
+    def test_delete_duties_by_id_empty(self, service, duty_days):
+        """Test bulk delete with empty list deletes nothing and leaves DB unchanged"""
         initial_count = Duty.objects.count()
 
-        deleted = service.bulk_delete_duties_by_id([])
+        deleted = service.delete_duties_by_id([])
 
-        assert deleted is None
+        assert deleted == {}
         assert Duty.objects.count() == initial_count
 
     def test_get_staff_duties(self, service, duty_assignments, date_range):
@@ -250,3 +282,210 @@ class TestManageAssignments:
 
         assert len(result) == len(dates)
         assert DaysOff.objects.filter(user=staff_user).count() == len(dates)
+
+    def assert_stats_match_assignments(self, service, start_date, end_date):
+        raw = service.duty_assignment_repo.get_duty_stats(start_date, end_date)
+        assert service.get_duty_stats(start_date, end_date) == list(raw)
+
+    def test_get_duty_stats_uses_rollup_for_whole_months(
+        self, service, staff_users, django_assert_num_queries
+    ):
+        """Test whole-month ranges are read from the rollup table only"""
+        duty = Duty.objects.create(date=date(2030, 1, 10))
+        DutyAssignment.objects.create(user=staff_users[0], duty=duty)
+
+        with django_assert_num_queries(1):
+            stats = service.get_duty_stats(date(2030, 1, 1), date(2030, 12, 31))
+
+        assert [(s["user_id"], s["duty_count"]) for s in stats] == [
+            (staff_users[0].id, 1)
+        ]
+
+    def test_get_duty_stats_partial_months(self, service, staff_users):
+        """Test partial edge months are counted only inside the range"""
+        for day in (date(2030, 1, 5), date(2030, 1, 20), date(2030, 2, 10)):
+            duty = Duty.objects.create(date=day)
+            DutyAssignment.objects.create(user=staff_users[0], duty=duty)
+        duty = Duty.objects.create(date=date(2030, 3, 25))
+        DutyAssignment.objects.create(user=staff_users[1], duty=duty)
+
+        self.assert_stats_match_assignments(
+            service, date(2030, 1, 10), date(2030, 3, 20)
+        )
+        self.assert_stats_match_assignments(
+            service, date(2030, 1, 1), date(2030, 3, 31)
+        )
+
+    def test_stats_follow_plan_and_bulk_delete(
+        self, service, staff_users, duty_days, date_range
+    ):
+        """Test plan generation and bulk delete keep the rollup in sync"""
+        start = date_range["start"].replace(day=1)
+        end = (date_range["end"] + timedelta(days=31)).replace(day=1) - timedelta(
+            days=1
+        )
+        service.create_plan(date_range["start"], date_range["end"], 2, seed=0)
+        self.assert_stats_match_assignments(service, start, end)
+
+        service.delete_duties_by_id([duty_days[0].id, duty_days[2].id])
+        self.assert_stats_match_assignments(service, start, end)
+
+    def test_stats_follow_range_delete(
+        self, service, staff_users, duty_days, date_range
+    ):
+        """Test range delete keeps the rollup in sync"""
+        start = date_range["start"].replace(day=1)
+        end = (date_range["end"] + timedelta(days=31)).replace(day=1) - timedelta(
+            days=1
+        )
+        service.create_plan(date_range["start"], date_range["end"], 2, seed=0)
+        assigned = DutyAssignment.objects.count()
+
+        deleted = service.delete_duties_in_range(
+            date_range["start"], date_range["start"] + timedelta(days=2)
+        )
+
+        assert deleted["planner.Duty"] == 3
+        assert DutyAssignment.objects.count() == (
+            assigned - deleted["planner.DutyAssignment"]
+        )
+        self.assert_stats_match_assignments(service, start, end)
+
+    def test_stats_add_is_additive(self, service, staff_user):
+        """Test counter updates add to the stored value and never go below zero"""
+        month = date(2030, 1, 1)
+
+        StaffMonthStats.objects.add({(staff_user.id, month): 2})
+        StaffMonthStats.objects.add({(staff_user.id, month): 3})
+        assert StaffMonthStats.objects.get(user=staff_user).duty_count == 5
+
+        StaffMonthStats.objects.add({(staff_user.id, month): -7})
+        assert StaffMonthStats.objects.get(user=staff_user).duty_count == 0
+
+    @pytest.mark.parametrize("model", [DutyAssignment, Duty])
+    def test_stats_follow_admin_bulk_delete(
+        self, service, duty_assignments, duty_days, date_range, rf, model
+    ):
+        """Test admin "delete selected" keeps the rollup in sync"""
+        model_admin = admin.site._registry[model]
+        ids = [duty_assignments[0].id, duty_assignments[2].id]
+        if model is Duty:
+            ids = [duty_days[0].id]
+
+        model_admin.delete_queryset(rf.post("/"), model.objects.filter(id__in=ids))
+
+        assert not model.objects.filter(id__in=ids).exists()
+        start = date_range["start"].replace(day=1)
+        self.assert_stats_match_assignments(service, start, start + timedelta(days=62))
+
+    def test_stats_follow_admin_duty_delete(
+        self, service, duty_assignments, duty_days, date_range, rf
+    ):
+        """Test deleting a duty in the admin keeps the rollup in sync"""
+        admin.site._registry[Duty].delete_model(rf.post("/"), duty_days[0])
+
+        start = date_range["start"].replace(day=1)
+        self.assert_stats_match_assignments(service, start, start + timedelta(days=62))
+
+    def test_rebuild_stats_command(self, service, duty_assignments, date_range):
+        """Test rebuild_stats restores counters from assignments"""
+        StaffMonthStats.objects.all().delete()
+
+        out = StringIO()
+        call_command("rebuild_stats", stdout=out)
+
+        assert out.getvalue().startswith("Rebuilt")
+        assert StaffMonthStats.objects.count() > 0
+        start = date_range["start"].replace(day=1)
+        self.assert_stats_match_assignments(service, start, start + timedelta(days=400))
+
+    def test_create_plans_fills_every_range(self, service, staff_users, date_range):
+        """Test batch generation plans all date sets"""
+        dates = date_range["dates"]
+
+        errors = service.create_plans([dates[4:], dates[:3]], 2, seed=0)
+
+        assert errors == {}
+        assert Duty.objects.count() == len(dates) - 1
+        for duty in Duty.objects.all():
+            assert duty.dutyassignment_set.count() == 2
+        assert Staff.objects.filter(priority=0).exists()
+
+    def test_create_plans_logs_the_seed(self, service, staff_users, date_range, caplog):
+        """Test the batch seed is logged and traced"""
+        dates = date_range["dates"]
+        trace_logger = logging.getLogger("planner.trace")
+        level = trace_logger.level
+        try:
+            trace_logger.setLevel(logging.DEBUG)
+            with caplog.at_level(logging.INFO, logger="planner"):
+                service.create_plans([dates[:3], dates[4:]], 2)
+        finally:
+            trace_logger.setLevel(level)
+
+        batch = next(
+            r for r in caplog.records if r.getMessage().startswith("plan 2 date sets")
+        )
+        seed = batch.args[-1]
+        assert isinstance(seed, int)
+        events = [r.trace for r in caplog.records if r.name == "planner.trace"]
+        assert events[0] == {"event": "plans", "ranges": 2, "seed": seed}
+
+    def test_create_plans_saves_changed_priorities_only(
+        self, service, staff_users, date_range, monkeypatch
+    ):
+        """Test staff without new duties keep their stored priority rows"""
+        saved = []
+        monkeypatch.setattr(
+            "planner.services.repositories.staff_repository."
+            "StaffRepository.bulk_update_priority",
+            lambda self, priorities: saved.append(priorities),
+        )
+
+        service.create_plans([date_range["dates"][:1]], 1, seed=0)
+
+        assigned = DutyAssignment.objects.get()
+        assert list(saved[0]) == [assigned.user_id]
+
+    def test_create_plans_is_chronological(self, service, staff_users, date_range):
+        """Test date sets are planned in date order whatever the input order"""
+        dates = date_range["dates"]
+
+        service.create_plans([dates[4:], dates[:3]], 2, seed=0)
+        reversed_input = sorted(
+            DutyAssignment.objects.values_list("duty__date", "user_id")
+        )
+        DutyAssignment.objects.all().delete()
+        Staff.objects.update(priority=0)
+        for user in staff_users:
+            Staff.objects.filter(id=user.id).update(priority=user.priority)
+        service.create_plans([dates[:3], dates[4:]], 2, seed=0)
+
+        assert (
+            sorted(DutyAssignment.objects.values_list("duty__date", "user_id"))
+            == reversed_input
+        )
+
+    def test_create_plans_reads_staff_once(self, service, staff_users, date_range):
+        """Test staff are read and priorities saved once for the whole batch"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        dates = date_range["dates"]
+        with CaptureQueriesContext(connection) as ctx:
+            service.create_plans([dates[:2], dates[3:5], dates[6:]], 1, seed=0)
+
+        statements = [q["sql"] for q in ctx.captured_queries]
+        staff_reads = [
+            q
+            for q in statements
+            if q.startswith("SELECT")
+            and 'FROM "planner_staff"' in q
+            and "WHERE" not in q
+        ]
+        staff_updates = [
+            q for q in statements if q.startswith('UPDATE "planner_staff"')
+        ]
+        assert len(staff_reads) == 1
+        # one bulk priority write plus the normalization
+        assert len(staff_updates) == 2
@@ -94,17 +94,112 @@ class TestPlanner:
             # Users should not overlap
             assert len(today_users & tomorrow_users) == 0
 
-    def test_update_priority(self, staff_user):
-        """Test updating priority"""
+    def test_create_plan_batches_writes(self, staff_users, date_range):
+        """Test plan is persisted with one INSERT and one priority UPDATE"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        for d in date_range["dates"]:
+            Duty.objects.create(date=d)
+
         planner = Planner(
-            start_date=staff_user.id,  # Dummy values
-            end_date=staff_user.id,
-            people_for_day=2,
+            start_date=date_range["start"], end_date=date_range["end"], people_for_day=2
         )
 
-        planner.update_priority(staff_user.id, value=10)
-        staff_user.refresh_from_db()
-        assert staff_user.priority == 10
+        with CaptureQueriesContext(connection) as ctx:
+            planner.create_plan()
+
+        statements = [q["sql"] for q in ctx.captured_queries]
+        inserts = [
+            q
+            for q in statements
+            if q.startswith('INSERT INTO "planner_dutyassignment"')
+        ]
+        updates = [q for q in statements if q.startswith('UPDATE "planner_staff"')]
+        assert len(inserts) == 1
+        assert len(updates) == 1
+        assert DutyAssignment.objects.count() == 2 * len(date_range["dates"])
+
+    def test_create_plan_saves_changed_priorities_only(self, staff_users, date_range):
+        """Test priorities of staff without new duties are not rewritten"""
+        Duty.objects.create(date=date_range["start"])
+        planner = Planner(
+            start_date=date_range["start"],
+            end_date=date_range["start"],
+            people_for_day=1,
+        )
+        saved = []
+        planner.staff_repo.bulk_update_priority = saved.append
+
+        planner.create_plan()
+
+        assigned = DutyAssignment.objects.get()
+        assert saved == [{assigned.user_id: planner.priorities[assigned.user_id]}]
+
+    def test_create_plan_query_count_independent_of_duties(
+        self, staff_users, date_range
+    ):
+        """Test existing assignment counts are not queried per duty"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        duties = [Duty.objects.create(date=d) for d in date_range["dates"]]
+        DutyAssignment.objects.create(user=staff_users[0], duty=duties[0])
+
+        short_planner = Planner(
+            start_date=date_range["dates"][0],
+            end_date=date_range["dates"][1],
+            people_for_day=1,
+        )
+        with CaptureQueriesContext(connection) as short_ctx:
+            short_planner.create_plan()
+
+        full_planner = Planner(
+            start_date=date_range["start"], end_date=date_range["end"], people_for_day=2
+        )
+        with CaptureQueriesContext(connection) as full_ctx:
+            full_planner.create_plan()
+
+        assert len(full_ctx.captured_queries) == len(short_ctx.captured_queries)
+        assert DutyAssignment.objects.filter(duty=duties[0]).count() == 2
+
+    def test_create_plan_same_seed_is_reproducible(self, staff_users, date_range):
+        """Test two runs with the same seed produce the same plan"""
+        from planner.models import Staff
+
+        for d in date_range["dates"]:
+            Duty.objects.create(date=d)
+        Staff.objects.update(priority=0)
+
+        plans = []
+        for _ in range(2):
+            planner = Planner(
+                start_date=date_range["start"],
+                end_date=date_range["end"],
+                people_for_day=2,
+                solver="flow",
+                seed=42,
+            )
+            planner.create_plan()
+            plans.append(
+                sorted(DutyAssignment.objects.values_list("duty__date", "user_id"))
+            )
+            DutyAssignment.objects.all().delete()
+            Staff.objects.update(priority=0)
+
+        assert plans[0] == plans[1]
+
+    def test_seed_is_generated_when_missing(self, tomorrow):
+        """Test a seed is recorded when none is given"""
+        import random
+
+        planner = Planner(start_date=tomorrow, end_date=tomorrow)
+        assert isinstance(planner.seed, int)
+
+        rng = random.Random(1)
+        planner = Planner(start_date=tomorrow, end_date=tomorrow, seed=rng)
+        assert planner.rng is rng
+        assert planner.seed is None
 
     def test_set_minimum_priority(self, staff_users):
         """Test normalizing priorities"""
@@ -226,3 +321,93 @@ class TestPlannerEdgeCases:
         # Should have warning message
         date_str = tomorrow.strftime("%Y-%m-%d")
         assert date_str in messages
+
+
+@pytest.mark.django_db
+class TestPlannerReplan:
+    """Tests for incremental re-planning"""
+
+    @pytest.fixture
+    def planned(self, staff_users, date_range):
+        for d in date_range["dates"]:
+            Duty.objects.create(date=d)
+        Planner(
+            start_date=date_range["start"],
+            end_date=date_range["end"],
+            people_for_day=2,
+            seed=0,
+        ).create_plan()
+        return sorted(DutyAssignment.objects.values_list("user_id", "duty_id"))
+
+    def replan(self, date_range, seed=0):
+        return Planner(
+            start_date=date_range["start"],
+            end_date=date_range["end"],
+            people_for_day=2,
+            seed=seed,
+        ).replan()
+
+    def test_replan_without_conflicts_changes_nothing(
+        self, planned, date_range, django_assert_max_num_queries
+    ):
+        """Test a clean plan is left as it is with a few reads"""
+        with django_assert_max_num_queries(5):
+            messages = self.replan(date_range)
+
+        assert messages == {}
+        assert sorted(DutyAssignment.objects.values_list("user_id", "duty_id")) == (
+            planned
+        )
+
+    def test_replan_only_touches_conflicting_duty(self, planned, date_range):
+        """Test a new day off re-plans only that duty and keeps priorities"""
+        from planner.models import DaysOff, Staff
+
+        assignment = DutyAssignment.objects.select_related("duty").order_by("id")[3]
+        DaysOff.objects.create(user_id=assignment.user_id, date=assignment.duty.date)
+        priorities = dict(Staff.objects.values_list("id", "priority"))
+
+        self.replan(date_range)
+
+        after = sorted(DutyAssignment.objects.values_list("user_id", "duty_id"))
+        changed = set(planned) ^ set(after)
+        assert {duty_id for _, duty_id in changed} == {assignment.duty_id}
+        assert (assignment.user_id, assignment.duty_id) not in after
+        assert DutyAssignment.objects.filter(duty=assignment.duty).count() == 2
+        new_user_id = next(u for u, d in set(after) - set(planned))
+        new_priorities = dict(Staff.objects.values_list("id", "priority"))
+        assert new_priorities[assignment.user_id] == (
+            priorities[assignment.user_id] - 1
+        )
+        assert new_priorities[new_user_id] == priorities[new_user_id] + 1
+        assert {
+            user_id: p
+            for user_id, p in new_priorities.items()
+            if user_id not in (assignment.user_id, new_user_id)
+        } == {
+            user_id: p
+            for user_id, p in priorities.items()
+            if user_id not in (assignment.user_id, new_user_id)
+        }
+
+    def test_replan_respects_both_neighbours(self, staff_users, date_range):
+        """Test a refilled duty never sits next to another duty of the user"""
+        from planner.models import DaysOff
+
+        duties = [Duty.objects.create(date=d) for d in date_range["dates"][:3]]
+        first, second, third = staff_users[:3]
+        DutyAssignment.objects.create(user=first, duty=duties[0])
+        DutyAssignment.objects.create(user=second, duty=duties[1])
+        DutyAssignment.objects.create(user=third, duty=duties[2])
+        DaysOff.objects.create(user=second, date=duties[1].date)
+
+        messages = Planner(
+            start_date=duties[0].date,
+            end_date=duties[2].date,
+            people_for_day=1,
+            seed=0,
+        ).replan()
+
+        refilled = DutyAssignment.objects.get(duty=duties[1])
+        assert refilled.user_id not in (first.id, second.id, third.id)
+        assert messages == {}
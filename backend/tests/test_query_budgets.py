@@ -0,0 +1,218 @@
+"""
+Query-count budgets for API endpoints.
+
+Every endpoint must issue a constant number of SQL queries regardless of how
+many staff, duties or dates it handles. Each test runs the endpoint on a small
+and a large dataset and checks both against the same budget, so a serializer
+or repository change that adds per-row queries fails here.
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from .generators import make_dataset
+
+SIZES = [(3, 2), (30, 20)]
+
+# Budgets include transaction savepoints.
+QUERY_BUDGETS = {
+    "users-list": 2,
+    "users-stats": 3,
+    "days-off-list": 1,
+    "days-off-create": 3,
+    "days-off-import": 5,
+    "list-assignments": 5,
+    "generate": 22,
+    "assign": 18,
+    "bulk-delete": 8,
+    "bulk-delete-range": 7,
+    "not-modified": 2,
+}
+
+
+def count_queries(request):
+    with CaptureQueriesContext(connection) as ctx:
+        response = request()
+    return response, len(ctx.captured_queries)
+
+
+def date_params(dataset):
+    return {
+        "start_date": dataset["start"].isoformat(),
+        "end_date": dataset["end"].isoformat(),
+    }
+
+
+@pytest.fixture(params=SIZES, ids=lambda size: f"{size[0]}staff-{size[1]}days")
+def dataset(request, db):
+    staff_count, duty_count = request.param
+    return make_dataset(
+        staff_count, duty_count, days_off_density=0.2, assigned_per_duty=2
+    )
+
+
+@pytest.mark.django_db
+class TestQueryBudgets:
+    """Query-count budgets per endpoint"""
+
+    def test_users_list(self, api_client, dataset):
+        response, queries = count_queries(lambda: api_client.get("/api/users/"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert queries <= QUERY_BUDGETS["users-list"], queries
+
+    def test_users_stats(self, api_client, dataset):
+        response, queries = count_queries(
+            lambda: api_client.get("/api/users/stats/", date_params(dataset))
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert queries <= QUERY_BUDGETS["users-stats"], queries
+
+    def test_days_off_list(self, api_client, dataset):
+        response, queries = count_queries(
+            lambda: api_client.get("/api/days-off/", date_params(dataset))
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert queries <= QUERY_BUDGETS["days-off-list"], queries
+
+    def test_days_off_create(self, authenticated_client, dataset):
+        after_range = dataset["end"] + timedelta(days=1)
+        data = {
+            "user": dataset["staff"][0].id,
+            "dates": [
+                (after_range + timedelta(days=i)).isoformat()
+                for i in range(len(dataset["duties"]))
+            ],
+        }
+
+        response, queries = count_queries(
+            lambda: authenticated_client.post("/api/days-off/", data, format="json")
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert queries <= QUERY_BUDGETS["days-off-create"], queries
+
+    def test_days_off_import(self, authenticated_client, dataset):
+        after_range = dataset["end"] + timedelta(days=1)
+        data = {
+            "entries": [
+                {
+                    "user": user.id,
+                    "dates": [
+                        (after_range + timedelta(days=i)).isoformat()
+                        for i in range(len(dataset["duties"]))
+                    ],
+                }
+                for user in dataset["staff"]
+            ]
+        }
+
+        response, queries = count_queries(
+            lambda: authenticated_client.post(
+                "/api/days-off/import/", data, format="json"
+            )
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert queries <= QUERY_BUDGETS["days-off-import"], queries
+
+    def test_list_assignments_not_modified(self, api_client, dataset):
+        etag = api_client.get(
+            "/api/duties/list_assignments/", date_params(dataset)
+        ).headers["ETag"]
+
+        response, queries = count_queries(
+            lambda: api_client.get(
+                "/api/duties/list_assignments/",
+                date_params(dataset),
+                HTTP_IF_NONE_MATCH=etag,
+            )
+        )
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert queries <= QUERY_BUDGETS["not-modified"], queries
+
+    def test_list_assignments(self, api_client, dataset):
+        response, queries = count_queries(
+            lambda: api_client.get(
+                "/api/duties/list_assignments/", date_params(dataset)
+            )
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["data"]) == len(dataset["duties"])
+        assert queries <= QUERY_BUDGETS["list-assignments"], queries
+
+    def test_generate(self, authenticated_client, dataset):
+        data = {
+            "dates": [duty.date.isoformat() for duty in dataset["duties"]],
+            "people_per_day": 3,
+        }
+
+        response, queries = count_queries(
+            lambda: authenticated_client.post(
+                "/api/duties/generate/", data, format="json"
+            )
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert queries <= QUERY_BUDGETS["generate"], queries
+
+    def test_assign(self, authenticated_client, dataset):
+        assignment = dataset["assignments"][0]
+        free_user = next(
+            user
+            for user in dataset["staff"]
+            if user.id
+            not in {
+                a.user_id for a in dataset["assignments"] if a.duty == assignment.duty
+            }
+        )
+        data = {
+            "user_id_prev": assignment.user_id,
+            "user_id_new": free_user.id,
+            "date": assignment.duty.date.isoformat(),
+        }
+
+        response, queries = count_queries(
+            lambda: authenticated_client.post(
+                "/api/duties/assign/",
+                data,
+                query_params=date_params(dataset),
+                format="json",
+            )
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert queries <= QUERY_BUDGETS["assign"], queries
+
+    def test_bulk_delete(self, authenticated_client, dataset):
+        data = {"duty_ids": [duty.id for duty in dataset["duties"]]}
+
+        response, queries = count_queries(
+            lambda: authenticated_client.post(
+                "/api/duties/bulk_delete/", data, format="json"
+            )
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert queries <= QUERY_BUDGETS["bulk-delete"], queries
+
+    def test_bulk_delete_range(self, authenticated_client, dataset):
+        data = date_params(dataset)
+
+        response, queries = count_queries(
+            lambda: authenticated_client.post(
+                "/api/duties/bulk_delete/", data, format="json"
+            )
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["deleted_duty_count"] == len(dataset["duties"])
+        assert queries <= QUERY_BUDGETS["bulk-delete-range"], queries
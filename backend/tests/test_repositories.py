@@ -1,9 +1,16 @@
 import pytest
-from django.db import IntegrityError
-from planner.models import Staff, DaysOff, Duty, DutyAssignment
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from datetime import date, timedelta
+
+from planner.models import Staff, DaysOff, Duty, DutyAssignment, StaffMonthStats
 from planner.services.repositories.staff_repository import StaffRepository
 from planner.services.repositories.days_off_repository import DaysOffRepository
 from planner.services.repositories.duty_repository import DutyRepository
+from planner.services.repositories.staff_month_stats_repository import (
+    StaffMonthStatsRepository,
+    full_months,
+)
 from planner.services.repositories.duty_assignment_repository import (
     DutyAssignmentRepository,
 )
@@ -86,39 +93,54 @@ class TestStaffRepository:
         staff_user.refresh_from_db()
         assert staff_user.priority == 0
 
-    def test_get_minimum_priority(self, repository, staff_users):
-        """Test getting minimum priority"""
-        # Set different priorities
-        Staff.objects.filter(id=staff_users[0].id).update(priority=5)
-        Staff.objects.filter(id=staff_users[1].id).update(priority=3)
-        Staff.objects.filter(id=staff_users[2].id).update(priority=7)
-        Staff.objects.filter(id=staff_users[4].id).update(priority=3)
-
-        min_priority = repository.get_minimum_priority()
-        assert min_priority == 3
-
-    def test_get_minimum_priority_no_positive_priorities(self, repository, staff_users):
-        """Test get_minimum_priority when all priorities are 0"""
-        Staff.objects.all().update(priority=0)
-        min_priority = repository.get_minimum_priority()
-        assert min_priority is None
-
-    def test_set_minimum_priority_for_all(self, repository, staff_users):
-        """Test normalizing priorities by subtracting minimum"""
-        # Set priorities: 5, 6, 7, 8
+    def test_bulk_update_priority(self, repository, staff_users):
+        """Test updating priorities of several staff at once"""
+        repository.bulk_update_priority({staff_users[0].id: 4, staff_users[1].id: -2})
+
+        staff_users[0].refresh_from_db()
+        staff_users[1].refresh_from_db()
+        assert staff_users[0].priority == 4
+        assert staff_users[1].priority == 0
+
+    def test_normalize_priorities_single_statement(
+        self, repository, staff_users, django_assert_num_queries
+    ):
+        """Test normalization is one UPDATE when debug logging is off"""
         for i, user in enumerate(staff_users):
-            Staff.objects.filter(id=user.id).update(priority=i + 5)
+            Staff.objects.filter(id=user.id).update(priority=i * 2)
 
-        repository.set_minimum_priority_for_all(5)
+        with django_assert_num_queries(1):
+            updated = repository.normalize_priorities()
 
-        priorities = list(
-            Staff.objects.filter(priority__gt=0)
-            .values_list("priority", flat=True)
-            .order_by("priority")
-        )
-        logger.info("priorities: %s", priorities)
-        assert min(priorities) == 1
-        assert priorities == [1, 2, 3, 4]
+        assert updated == len(staff_users) - 1
+        assert sorted(Staff.objects.values_list("priority", flat=True)) == [
+            0,
+            *range(0, 2 * (len(staff_users) - 1), 2),
+        ]
+
+    def test_normalize_priorities_all_zero(self, repository, staff_users):
+        """Test nothing changes when nobody has a positive priority"""
+        Staff.objects.update(priority=0)
+
+        assert repository.normalize_priorities() == 0
+        assert set(Staff.objects.values_list("priority", flat=True)) == {0}
+
+    def test_normalize_priorities_debug_log(self, repository, staff_users, caplog):
+        """Test debug logging records changed priorities"""
+        Staff.objects.update(priority=0)
+        Staff.objects.filter(id=staff_users[0].id).update(priority=3)
+        Staff.objects.filter(id=staff_users[1].id).update(priority=5)
+
+        with caplog.at_level(
+            logging.DEBUG, logger="planner.services.repositories.staff_repository"
+        ):
+            repository.normalize_priorities()
+
+        record = caplog.records[-1]
+        assert record.priorities == {
+            staff_users[0].id: (3, 0),
+            staff_users[1].id: (5, 2),
+        }
 
 
 @pytest.mark.django_db
@@ -155,6 +177,11 @@ class TestDaysOffRepository:
         result = repository.get_list_of_days_off(date_range["start"], date_range["end"])
         assert result.count() == len(days_off_multiple)
 
+    def test_get_user_date_pairs(self, repository, days_off_multiple, date_range):
+        """Test getting (user_id, date) pairs within date range"""
+        result = repository.get_user_date_pairs(date_range["start"], date_range["end"])
+        assert set(result) == {(d.user_id, d.date) for d in days_off_multiple}
+
     def test_delete_day_off(self, repository, day_off):
         """Test deleting day off"""
         repository.delete(day_off.id)
@@ -192,6 +219,11 @@ class TestDutyRepository:
         previous_duty_id = repository.get_previous_duty(first_date)
         assert previous_duty_id is None
 
+    def test_get_id_date_pairs(self, repository, duty_days):
+        """Test getting ordered (id, date) pairs within date range"""
+        result = repository.get_id_date_pairs(duty_days[1].date, duty_days[3].date)
+        assert list(result) == [(d.id, d.date) for d in duty_days[1:4]]
+
     def test_get_list_of_duties(self, repository, duty_days, date_range):
         """Test getting duties within date range"""
         result = repository.get_list_of_duties(date_range["start"], date_range["end"])
@@ -217,63 +249,100 @@ class TestDutyRepository:
         dates = list(result.values_list("date", flat=True))
         assert dates == sorted(dates)
 
-    def test_save_duty_days(self, repository, date_range):
-        """Test bulk creating duty days"""
+    def test_upsert_duty_days_reports_created_and_existing(
+        self, repository, date_range
+    ):
+        """Test upsert creates only missing dates and reports both groups"""
         dates = date_range["dates"]
-        result = repository.save_duty_days(dates)
+        repository.upsert_duty_days(dates[:3])
 
-        assert len(result) == len(dates)
+        created, existing = repository.upsert_duty_days(dates)
+
+        assert created == dates[3:]
+        assert existing == dates[:3]
         assert Duty.objects.count() == len(dates)
 
-    def test_save_duty_days_idempotent(self, repository, date_range):
-        """Test that save_duty_days is idempotent"""
+    def test_upsert_duty_days_leaves_existing_rows(
+        self, repository, date_range, django_assert_num_queries
+    ):
+        """Test repeated upsert neither rewrites nor re-reads duties"""
         dates = date_range["dates"]
-        repository.save_duty_days(dates)
-        count1 = Duty.objects.count()
+        repository.upsert_duty_days(dates)
+        stamps = list(Duty.objects.order_by("date").values_list("updated_at"))
 
-        repository.save_duty_days(dates)
-        count2 = Duty.objects.count()
+        with django_assert_num_queries(1):
+            created, existing = repository.upsert_duty_days(dates)
 
-        assert count1 == count2
+        assert created == []
+        assert existing == dates
+        assert list(Duty.objects.order_by("date").values_list("updated_at")) == stamps
 
-    def test_bulk_delete_by_id(self, repository, duty_days):
+    def test_delete_by_ids(self, repository, duty_days):
         """Test bulk delete removes duties and returns correct count"""
         ids = [duty_days[0].id, duty_days[1].id]
         initial_count = Duty.objects.count()
 
-        deleted = repository.bulk_delete_by_id(ids)
+        deleted = repository.delete_by_ids(ids)
 
-        assert deleted == len(ids)
+        assert deleted[Duty._meta.label] == len(ids)
         assert Duty.objects.count() == initial_count - len(ids)
 
-    def test_bulk_delete_by_id_empty_list(self, repository, duty_days):
-        """Test bulk delete with empty list returns None and does not change DB"""
+    def test_delete_by_ids_empty_list(self, repository, duty_days):
+        """Test bulk delete with empty list deletes nothing and does not change DB"""
         initial_count = Duty.objects.count()
 
-        deleted = repository.bulk_delete_by_id([])
+        deleted = repository.delete_by_ids([])
 
-        assert deleted is None
+        assert deleted == {}
         assert Duty.objects.count() == initial_count
 
-    def test_bulk_delete_by_id_nonexistent(self, repository):
-        """Test bulk delete with non-existent ids returns None"""
-        deleted = repository.bulk_delete_by_id([99999, 99998])
+    def test_delete_by_ids_nonexistent(self, repository):
+        """Test bulk delete with non-existent ids deletes nothing"""
+        deleted = repository.delete_by_ids([99999, 99998])
 
-        assert deleted is None
+        assert deleted == {}
 
-    def test_bulk_delete_by_id_cascades_assignments(
+    def test_delete_by_ids_cascades_assignments(
         self, repository, duty_with_assignments
     ):
         """Test that bulk delete of duties also removes related DutyAssignment records"""
         duty = duty_with_assignments["duty"]
         assignments_count = DutyAssignment.objects.count()
 
-        repository.bulk_delete_by_id([duty.id])
+        repository.delete_by_ids([duty.id])
 
         # All assignments for that duty should be gone (cascade)
         assert DutyAssignment.objects.count() == 0
         assert assignments_count == 2
 
+    def test_delete_in_range(self, repository, duty_assignments, date_range):
+        """Test range delete removes duties of the range with their assignments"""
+        outside = Duty.objects.create(date=date_range["end"] + timedelta(days=1))
+
+        deleted = repository.delete_in_range(date_range["start"], date_range["end"])
+
+        assert deleted == {
+            "planner.DutyAssignment": len(duty_assignments),
+            "planner.Duty": len(date_range["dates"]),
+        }
+        assert list(Duty.objects.all()) == [outside]
+        assert DutyAssignment.objects.count() == 0
+
+    def test_delete_in_range_empty(self, repository, date_range):
+        """Test range delete of an empty range reports nothing"""
+        assert repository.delete_in_range(date_range["start"], date_range["end"]) == {}
+
+    def test_delete_issues_one_statement_per_model(
+        self, repository, duty_assignments, duty_days
+    ):
+        """Test cascading delete does not load duties or assignments"""
+        with CaptureQueriesContext(connection) as ctx:
+            repository.delete_by_ids([duty.id for duty in duty_days])
+
+        statements = [q["sql"].split()[0] for q in ctx.captured_queries]
+        assert statements.count("DELETE") == 2
+        assert "SELECT" not in statements
+
 
 @pytest.mark.django_db
 class TestDutyAssignmentRepository:
@@ -308,6 +377,22 @@ class TestDutyAssignmentRepository:
         result = repository.user_has_assignment_for_duty_id(staff_user.id, duty_day.id)
         assert result is False
 
+    def test_bulk_create(self, repository, staff_users, duty_day):
+        """Test creating several assignments at once"""
+        repository.bulk_create(
+            [(staff_users[0].id, duty_day.id), (staff_users[1].id, duty_day.id)]
+        )
+        assert DutyAssignment.objects.filter(duty=duty_day).count() == 2
+
+    def test_get_user_duty_pairs(self, repository, duty_assignments, duty_days):
+        """Test getting (user_id, duty_id) pairs for given duties"""
+        result = repository.get_user_duty_pairs([duty_days[0].id])
+        assert set(result) == {
+            (a.user_id, a.duty_id)
+            for a in duty_assignments
+            if a.duty_id == duty_days[0].id
+        }
+
     def test_get_list_of_duty_assignment(
         self, repository, duty_assignments, date_range
     ):
@@ -408,3 +493,74 @@ class TestDutyAssignmentRepository:
         # Month 2 has 1 duty
         month2_row = next(r for r in user_rows if r["month"].month == month2_date.month)
         assert month2_row["duty_count"] == 1
+
+
+@pytest.mark.parametrize(
+    "start_date, end_date, expected",
+    [
+        (date(2030, 1, 1), date(2030, 3, 31), (date(2030, 1, 1), date(2030, 3, 1))),
+        (date(2030, 1, 15), date(2030, 3, 31), (date(2030, 2, 1), date(2030, 3, 1))),
+        (date(2030, 1, 1), date(2030, 3, 30), (date(2030, 1, 1), date(2030, 2, 1))),
+        (date(2030, 12, 2), date(2031, 1, 31), (date(2031, 1, 1), date(2031, 1, 1))),
+        (date(2030, 1, 2), date(2030, 2, 27), None),
+    ],
+)
+def test_full_months(start_date, end_date, expected):
+    assert full_months(start_date, end_date) == expected
+
+
+@pytest.mark.django_db
+class TestStaffMonthStatsRepository:
+    """Tests for StaffMonthStatsRepository"""
+
+    @pytest.fixture
+    def repository(self):
+        return StaffMonthStatsRepository()
+
+    def test_assignment_writes_update_counters(self, repository, staff_users):
+        """Test counters follow assignment create, update and delete"""
+        duty = Duty.objects.create(date=date(2030, 1, 10))
+        assignment = DutyAssignment.objects.create(user=staff_users[0], duty=duty)
+        DutyAssignment.objects.create(user=staff_users[1], duty=duty)
+
+        assignment.user = staff_users[2]
+        assignment.save()
+        DutyAssignment.objects.get(user=staff_users[1]).delete()
+
+        counts = {
+            s.user_id: s.duty_count
+            for s in StaffMonthStats.objects.filter(month=date(2030, 1, 1))
+        }
+        assert counts == {
+            staff_users[0].id: 0,
+            staff_users[1].id: 0,
+            staff_users[2].id: 1,
+        }
+
+    def test_get_duty_stats_skips_empty_counters(self, repository, staff_users):
+        """Test only users with duties in the months are returned"""
+        repository.add({(staff_users[0].id, date(2030, 1, 1)): 2})
+        repository.add({(staff_users[1].id, date(2030, 1, 1)): 0})
+        repository.add({(staff_users[1].id, date(2030, 3, 1)): 1})
+
+        result = list(repository.get_duty_stats(date(2030, 1, 1), date(2030, 2, 1)))
+
+        assert result == [
+            {
+                "user_id": staff_users[0].id,
+                "user__email": staff_users[0].email,
+                "month": date(2030, 1, 1),
+                "duty_count": 2,
+            }
+        ]
+
+    def test_rebuild_replaces_counters(self, repository, staff_users):
+        """Test rebuild drops drifted counters"""
+        repository.add({(staff_users[0].id, date(2030, 1, 1)): 5})
+
+        created = repository.rebuild({(staff_users[1].id, date(2030, 2, 1)): 1})
+
+        assert created == 1
+        assert list(StaffMonthStats.objects.values_list("user_id", "duty_count")) == [
+            (staff_users[1].id, 1)
+        ]
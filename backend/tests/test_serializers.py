@@ -12,9 +12,11 @@ from planner.serializers import (
     DutyAssignmentChangeSerializer,
     DutyAssignmentGenerateSerializer,
     DutyAssignmentSerializer,
+    DutyBulkDeleteSerializer,
     DutyIdsSerializer,
     DutyWithAssignmentsSerializer,
     StaffSerializer,
+    serialize_duties,
 )
 from planner.validators import validate_date_not_past
 from rest_framework import serializers as drf_serializers
@@ -275,6 +277,41 @@ class TestDutyAssignmentGenerateSerializer:
 
         assert not serializer.is_valid()
 
+    def test_default_solver(self, date_range):
+        """Тест алгоритма генерации по умолчанию"""
+        data = {
+            "dates": [d.isoformat() for d in date_range["dates"]],
+            "people_per_day": 2,
+        }
+        serializer = DutyAssignmentGenerateSerializer(data=data)
+
+        assert serializer.is_valid()
+        assert serializer.validated_data["solver"] == "greedy"
+
+    def test_unknown_solver(self, date_range):
+        """Тест неизвестного алгоритма генерации"""
+        data = {
+            "dates": [d.isoformat() for d in date_range["dates"]],
+            "people_per_day": 2,
+            "solver": "unknown",
+        }
+        serializer = DutyAssignmentGenerateSerializer(data=data)
+
+        assert not serializer.is_valid()
+        assert "solver" in serializer.errors
+
+    def test_negative_seed(self, date_range):
+        """Тест отрицательного seed"""
+        data = {
+            "dates": [d.isoformat() for d in date_range["dates"]],
+            "people_per_day": 2,
+            "seed": -1,
+        }
+        serializer = DutyAssignmentGenerateSerializer(data=data)
+
+        assert not serializer.is_valid()
+        assert "seed" in serializer.errors
+
     def test_invalid_date_in_list(self, date_range):
         """Тест некорректной даты в списке"""
         dates = [d.isoformat() for d in date_range["dates"]]
@@ -394,6 +431,29 @@ class TestDutyWithAssignmentsSerializer:
         assert len(data[0]["users"]) == 2
         assert len(data[1]["users"]) == 1
 
+    def test_serialize_duties_compact(self, duty_days, staff_users):
+        """Тест компактного формата: id пользователей и общий словарь staff"""
+        DutyAssignment.objects.create(user=staff_users[0], duty=duty_days[0])
+        DutyAssignment.objects.create(user=staff_users[1], duty=duty_days[0])
+        DutyAssignment.objects.create(user=staff_users[0], duty=duty_days[1])
+
+        data = serialize_duties(duty_days[:3], compact=True)
+
+        assert sorted(data["data"][0]["users"]) == sorted(
+            [staff_users[0].id, staff_users[1].id]
+        )
+        assert data["data"][1]["users"] == [staff_users[0].id]
+        assert data["data"][2]["users"] == []
+        assert set(data["staff"]) == {staff_users[0].id, staff_users[1].id}
+        assert data["staff"][staff_users[0].id]["email"] == staff_users[0].email
+
+    def test_serialize_duties_full(self, duty_with_assignments):
+        """Тест полного формата по умолчанию"""
+        data = serialize_duties([duty_with_assignments["duty"]])
+
+        assert "staff" not in data
+        assert len(data["data"][0]["users"]) == 2
+
     def test_users_field_structure(self, duty_with_assignments):
         """Тест структуры поля users"""
         duty = duty_with_assignments["duty"]
@@ -438,3 +498,43 @@ class TestDutyIdsSerializer:
 
         assert not serializer.is_valid()
         assert "duty_ids" in serializer.errors
+
+
+class TestDutyBulkDeleteSerializer:
+    """Тесты для DutyBulkDeleteSerializer"""
+
+    def test_ids_mode(self):
+        """Тест что список duty_ids валиден"""
+        serializer = DutyBulkDeleteSerializer(data={"duty_ids": [1, 2]})
+
+        assert serializer.is_valid()
+        assert serializer.validated_data == {"duty_ids": [1, 2]}
+
+    def test_range_mode(self):
+        """Тест что диапазон дат валиден"""
+        data = {"start_date": "2030-01-01", "end_date": "2030-12-31"}
+        serializer = DutyBulkDeleteSerializer(data=data)
+
+        assert serializer.is_valid()
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            {},
+            {"start_date": "2030-01-01"},
+            {"duty_ids": [1], "start_date": "2030-01-01", "end_date": "2030-01-31"},
+        ],
+    )
+    def test_requires_one_mode(self, data):
+        """Тест что нужно указать либо duty_ids, либо обе даты"""
+        serializer = DutyBulkDeleteSerializer(data=data)
+
+        assert not serializer.is_valid()
+        assert "Нужно указать duty_ids" in str(serializer.errors)
+
+    def test_reversed_range(self):
+        """Тест что start_date не может быть позже end_date"""
+        data = {"start_date": "2030-02-01", "end_date": "2030-01-01"}
+        serializer = DutyBulkDeleteSerializer(data=data)
+
+        assert not serializer.is_valid()
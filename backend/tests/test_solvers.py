@@ -0,0 +1,206 @@
+"""
+Tests for plan solver backends
+"""
+
+import itertools
+import random
+import time
+from datetime import timedelta
+
+import pytest
+from planner.models import DaysOff, Duty, DutyAssignment, Staff
+from planner.services.planner import Planner
+from planner.services.repositories.duty_repository import DutyRepository
+from planner.services.solvers import (
+    GreedyHeapSolver,
+    MinCostFlowSolver,
+    PlanSolver,
+    get_solver,
+)
+from planner.services.staff_availability import StaffAvailabilitySnapshot
+
+
+def solve(solver, start_date, end_date, people_for_day):
+    duties = list(DutyRepository().get_list_of_duties(start_date, end_date, True))
+    users = [(u.priority, u.id) for u in Staff.objects.order_by("id")]
+    availability = StaffAvailabilitySnapshot(start_date, end_date)
+    return solver.solve(duties, users, people_for_day, availability)
+
+
+def brute_force_fill(staff, dates, days_off, people_for_day):
+    """Returns the most slots any valid plan fills, by trying every plan"""
+    plans = []
+    for user in staff:
+        options = []
+        for mask in range(1 << len(dates)):
+            days = [i for i in range(len(dates)) if mask >> i & 1]
+            if any(b - a == 1 for a, b in zip(days, days[1:])):
+                continue
+            if any((user.id, dates[i]) in days_off for i in days):
+                continue
+            options.append(days)
+        plans.append(options)
+    best = 0
+    for plan in itertools.product(*plans):
+        per_day = [0] * len(dates)
+        for days in plan:
+            for i in days:
+                per_day[i] += 1
+        if max(per_day) <= people_for_day:
+            best = max(best, sum(per_day))
+    return best
+
+
+def make_instance(today, priorities, day_count, days_off):
+    staff = [
+        Staff.objects.create(
+            first_name=str(i), email=f"user{i}@example.com", priority=priority
+        )
+        for i, priority in enumerate(priorities)
+    ]
+    dates = [today + timedelta(days=i) for i in range(day_count)]
+    Duty.objects.bulk_create(Duty(date=d) for d in dates)
+    DaysOff.objects.bulk_create(
+        DaysOff(user=staff[s], date=dates[i]) for s, i in days_off
+    )
+    return staff, dates, {(staff[s].id, dates[i]) for s, i in days_off}
+
+
+class TestGetSolver:
+    """Tests for solver registry"""
+
+    def test_get_solver_by_name(self):
+        assert isinstance(get_solver("greedy"), GreedyHeapSolver)
+        assert isinstance(get_solver("flow"), MinCostFlowSolver)
+
+    def test_plan_solver_is_abstract(self):
+        with pytest.raises(TypeError):
+            PlanSolver()
+
+    def test_get_solver_unknown(self):
+        with pytest.raises(ValueError):
+            get_solver("unknown")
+
+
+@pytest.mark.django_db
+class TestMinCostFlowSolver:
+    """Tests for MinCostFlowSolver"""
+
+    def test_fills_day_greedy_leaves_short(self, today):
+        """Test flow moves a user to free a day for someone else"""
+        first = Staff.objects.create(first_name="A", email="a@example.com")
+        second = Staff.objects.create(first_name="B", email="b@example.com", priority=1)
+        dates = [today, today + timedelta(days=1)]
+        for d in dates:
+            Duty.objects.create(date=d)
+        DaysOff.objects.create(user=second, date=dates[1])
+
+        greedy = solve(GreedyHeapSolver(), dates[0], dates[1], 1)
+        flow = solve(MinCostFlowSolver(), dates[0], dates[1], 1)
+
+        assert sorted(greedy.counts.values()) == [0, 1]
+        assert sorted(flow.counts.values()) == [1, 1]
+        assert {user_id for user_id, _ in flow.assignments} == {first.id, second.id}
+        assert flow.priorities == {first.id: 1, second.id: 2}
+
+    def test_moved_user_takes_freed_day(self, today):
+        """Test a user moved along the path can also take the freed day"""
+        staff, dates, days_off = make_instance(today, [1, 0], 3, [(1, 2)])
+
+        solution = solve(MinCostFlowSolver(), dates[0], dates[-1], 1)
+
+        assert len(solution.assignments) == brute_force_fill(staff, dates, days_off, 1)
+        assert sorted(solution.assignments) == sorted(
+            [
+                (staff[0].id, Duty.objects.get(date=dates[0]).id),
+                (staff[1].id, Duty.objects.get(date=dates[1]).id),
+                (staff[0].id, Duty.objects.get(date=dates[2]).id),
+            ]
+        )
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_fills_as_many_slots_as_brute_force(self, today, seed):
+        """Test small random plans are filled as far as any plan can be"""
+        rng = random.Random(seed)
+        staff_count = rng.randint(1, 3)
+        day_count = rng.randint(1, 5)
+        people_for_day = rng.randint(1, 2)
+        priorities = [rng.randrange(3) for _ in range(staff_count)]
+        days_off = [
+            (s, i)
+            for s in range(staff_count)
+            for i in range(day_count)
+            if rng.random() < 0.3
+        ]
+        staff, dates, days_off = make_instance(today, priorities, day_count, days_off)
+
+        solution = solve(MinCostFlowSolver(), dates[0], dates[-1], people_for_day)
+
+        assert len(solution.assignments) == brute_force_fill(
+            staff, dates, days_off, people_for_day
+        )
+
+    def test_respects_days_off_and_consecutive_duties(
+        self, staff_users, duty_days, days_off_multiple, date_range
+    ):
+        """Test flow never assigns on a day off or on consecutive duties"""
+        solution = solve(MinCostFlowSolver(), date_range["start"], date_range["end"], 2)
+
+        days_off = {(d.user_id, d.date) for d in days_off_multiple}
+        index_by_duty = {duty.id: i for i, duty in enumerate(duty_days)}
+        taken = {(u, index_by_duty[d]) for u, d in solution.assignments}
+        for user_id, i in taken:
+            assert (user_id, duty_days[i].date) not in days_off
+            assert (user_id, i + 1) not in taken
+
+    def test_keeps_existing_assignments(self, staff_users, duty_days, date_range):
+        """Test existing assignments count towards the day and block neighbours"""
+        DutyAssignment.objects.create(user=staff_users[0], duty=duty_days[1])
+
+        solution = solve(MinCostFlowSolver(), date_range["start"], date_range["end"], 1)
+
+        assert solution.counts[duty_days[1].id] == 1
+        assert (staff_users[0].id, duty_days[0].id) not in solution.assignments
+        assert (staff_users[0].id, duty_days[2].id) not in solution.assignments
+
+    def test_create_plan_with_flow_solver(self, staff_users, duty_days, date_range):
+        """Test Planner persists the flow solution"""
+        planner = Planner(
+            start_date=date_range["start"],
+            end_date=date_range["end"],
+            people_for_day=2,
+            solver="flow",
+        )
+
+        messages = planner.create_plan()
+
+        assert messages == {}
+        assert DutyAssignment.objects.count() == 2 * len(duty_days)
+
+    @pytest.mark.slow
+    def test_solves_large_plan_quickly(self, today):
+        """Test hundreds of staff over 90 days are solved within a second"""
+        Staff.objects.bulk_create(
+            Staff(first_name=str(i), email=f"user{i}@example.com", priority=i % 3)
+            for i in range(300)
+        )
+        Duty.objects.bulk_create(
+            Duty(date=today + timedelta(days=i)) for i in range(90)
+        )
+        staff_ids = list(Staff.objects.values_list("id", flat=True))
+        DaysOff.objects.bulk_create(
+            DaysOff(user_id=user_id, date=today + timedelta(days=i))
+            for i in range(90)
+            for user_id in staff_ids[i % 7 :: 7]
+        )
+        end_date = today + timedelta(days=89)
+        duties = list(DutyRepository().get_list_of_duties(today, end_date, True))
+        users = [(u.priority, u.id) for u in Staff.objects.all()]
+        availability = StaffAvailabilitySnapshot(today, end_date)
+
+        started = time.perf_counter()
+        solution = MinCostFlowSolver().solve(duties, users, 10, availability)
+        elapsed = time.perf_counter() - started
+
+        assert elapsed < 1
+        assert all(count == 10 for count in solution.counts.values())
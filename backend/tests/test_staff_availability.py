@@ -3,7 +3,10 @@ Tests for StaffAvailability service
 """
 
 import pytest
-from planner.services.staff_availability import StaffAvailability
+from planner.services.staff_availability import (
+    StaffAvailability,
+    StaffAvailabilitySnapshot,
+)
 
 
 @pytest.mark.django_db
@@ -86,3 +89,85 @@ class TestStaffAvailability:
             duty_assignment.user.id, duty_assignment.duty.date
         )
         assert result is True
+
+
+@pytest.mark.django_db
+class TestStaffAvailabilitySnapshot:
+    """Tests for StaffAvailabilitySnapshot class"""
+
+    def test_matches_staff_availability(
+        self, staff_users, duty_days, duty_assignments, days_off_multiple, date_range
+    ):
+        """Test snapshot answers the same as the query-based checks"""
+        snapshot = StaffAvailabilitySnapshot(date_range["start"], date_range["end"])
+        availability = StaffAvailability()
+
+        for user in staff_users:
+            for duty in duty_days:
+                assert snapshot.is_unavailable(
+                    user.id, duty.date
+                ) == availability.is_unavailable(user.id, duty.date)
+
+    def test_previous_duty_before_window(self, duty_days, staff_users):
+        """Test the duty preceding the window is taken into account"""
+        from planner.models import DutyAssignment
+
+        DutyAssignment.objects.create(user=staff_users[0], duty=duty_days[2])
+
+        snapshot = StaffAvailabilitySnapshot(duty_days[3].date, duty_days[-1].date)
+
+        assert snapshot.has_previous_duty(staff_users[0].id, duty_days[3].date)
+        assert not snapshot.has_previous_duty(staff_users[1].id, duty_days[3].date)
+
+    def test_add_assignment(self, duty_days, staff_users, date_range):
+        """Test registered assignments affect current and next duty"""
+        snapshot = StaffAvailabilitySnapshot(date_range["start"], date_range["end"])
+        user_id = staff_users[0].id
+
+        snapshot.add_assignment(user_id, duty_days[0].id)
+
+        assert snapshot.has_current_duty(user_id, duty_days[0].date)
+        assert snapshot.has_previous_duty(user_id, duty_days[1].date)
+        assert not snapshot.is_unavailable(user_id, duty_days[2].date)
+
+    def test_checks_do_not_query(
+        self, django_assert_num_queries, duty_days, days_off_multiple, date_range
+    ):
+        """Test availability checks are answered without database queries"""
+        snapshot = StaffAvailabilitySnapshot(date_range["start"], date_range["end"])
+
+        with django_assert_num_queries(0):
+            for day_off in days_off_multiple:
+                assert snapshot.is_unavailable(day_off.user_id, day_off.date)
+
+    def test_check_next_blocks_day_before_next_duty(self, duty_days, staff_users):
+        """Test check_next also looks at the duty after the window"""
+        from planner.models import DutyAssignment
+
+        DutyAssignment.objects.create(user=staff_users[0], duty=duty_days[3])
+
+        snapshot = StaffAvailabilitySnapshot(
+            duty_days[0].date, duty_days[2].date, check_next=True
+        )
+
+        assert snapshot.is_unavailable(staff_users[0].id, duty_days[2].date)
+        assert not snapshot.is_unavailable(staff_users[0].id, duty_days[1].date)
+
+    def test_pop_conflicts(self, duty_days, staff_users, date_range):
+        """Test conflicts drop the later of consecutive duties and days off"""
+        from planner.models import DaysOff, DutyAssignment
+
+        user, other = staff_users[0], staff_users[1]
+        for duty in duty_days[:3]:
+            DutyAssignment.objects.create(user=user, duty=duty)
+        DutyAssignment.objects.create(user=other, duty=duty_days[4])
+        DaysOff.objects.create(user=other, date=duty_days[4].date)
+
+        snapshot = StaffAvailabilitySnapshot(
+            date_range["start"], date_range["end"], check_next=True
+        )
+        conflicts = snapshot.pop_conflicts()
+
+        assert conflicts == [(user.id, duty_days[1].id), (other.id, duty_days[4].id)]
+        assert snapshot.has_current_duty(user.id, duty_days[2].date)
+        assert not snapshot.has_current_duty(user.id, duty_days[1].date)
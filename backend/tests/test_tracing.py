@@ -0,0 +1,221 @@
+"""
+Tests for planner decision tracing
+"""
+
+import json
+import logging
+
+import pytest
+from planner.models import DaysOff, Duty, Staff
+from planner.services.assignments import ManageAssignments
+from planner.services.planner import Planner
+from planner.services.tracing import PlanTrace
+
+
+def make_planner(date_range, trace=None, solver="greedy"):
+    for d in date_range["dates"]:
+        Duty.objects.create(date=d)
+    return Planner(
+        start_date=date_range["start"],
+        end_date=date_range["end"],
+        people_for_day=2,
+        solver=solver,
+        seed=0,
+        trace=trace,
+    )
+
+
+class TestPlanTrace:
+    """Tests for PlanTrace"""
+
+    def test_disabled_records_nothing(self):
+        trace = PlanTrace(enabled=False)
+
+        trace.record("assign", user_id=1)
+
+        assert trace.events == []
+        assert trace.trace_id == ""
+
+    def test_enabled_records_events(self):
+        trace = PlanTrace(enabled=True)
+
+        trace.record("assign", user_id=1)
+
+        assert trace.events == [{"event": "assign", "user_id": 1}]
+        assert len(trace.trace_id) == 32
+
+    def test_lines_are_json(self, today):
+        trace = PlanTrace(enabled=True)
+        trace.record("duty", date=today, duty_id=1)
+
+        lines = list(trace.lines())
+
+        assert json.loads(lines[0]) == {
+            "trace_id": trace.trace_id,
+            "event": "duty",
+            "date": today.isoformat(),
+            "duty_id": 1,
+        }
+
+    def test_save(self, tmp_path):
+        trace = PlanTrace(enabled=True)
+        trace.record("assign", user_id=1)
+        trace.record("assign", user_id=2)
+
+        path = trace.save(tmp_path)
+
+        assert path == tmp_path / f"{trace.trace_id}.jsonl"
+        assert len(path.read_text().splitlines()) == 2
+
+    def test_save_disabled(self, tmp_path):
+        assert PlanTrace(enabled=False).save(tmp_path) is None
+        assert list(tmp_path.iterdir()) == []
+
+    def test_follows_logger_level(self):
+        trace_logger = logging.getLogger("planner.trace")
+        level = trace_logger.level
+        try:
+            trace_logger.setLevel(logging.DEBUG)
+            assert PlanTrace().enabled
+            trace_logger.setLevel(logging.INFO)
+            assert not PlanTrace().enabled
+        finally:
+            trace_logger.setLevel(level)
+
+
+@pytest.mark.django_db
+class TestPlannerTracing:
+    """Tests for decision events recorded by the planner"""
+
+    def test_off_by_default(self, staff_users, date_range):
+        planner = make_planner(date_range)
+
+        planner.create_plan()
+
+        assert not planner.trace.enabled
+        assert planner.trace.events == []
+
+    @pytest.mark.parametrize("solver", ["greedy", "flow"])
+    def test_records_plan_and_duties(self, staff_users, date_range, solver):
+        planner = make_planner(date_range, PlanTrace(enabled=True), solver)
+
+        planner.create_plan()
+
+        events = [event["event"] for event in planner.trace.events]
+        assert events[0] == "plan"
+        assert planner.trace.events[0]["seed"] == 0
+        assert events.count("duty") == len(date_range["dates"])
+
+    def test_greedy_records_assignments(self, staff_users, date_range):
+        planner = make_planner(date_range, PlanTrace(enabled=True))
+
+        planner.create_plan()
+
+        assigned = {
+            (event["user_id"], event["duty_id"])
+            for event in planner.trace.events
+            if event["event"] == "assign"
+        }
+        assert len(assigned) == 2 * len(date_range["dates"])
+
+    def test_skip_reason(self, date_range):
+        first = Staff.objects.create(first_name="A", email="a@example.com")
+        second = Staff.objects.create(first_name="B", email="b@example.com", priority=1)
+        DaysOff.objects.create(user=first, date=date_range["start"])
+        trace = PlanTrace(enabled=True)
+        planner = make_planner(date_range, trace)
+        planner.people_for_day = 1
+
+        planner.create_plan()
+
+        skips = [event for event in trace.events if event["event"] == "skip"]
+        assert skips[0]["user_id"] == first.id
+        assert skips[0]["reason"] == "day_off"
+        assert {skip["reason"] for skip in skips} <= {"day_off", "previous_duty"}
+        filled = next(event for event in trace.events if event["event"] == "filled")
+        assert filled == {
+            "event": "filled",
+            "duty_id": skips[0]["duty_id"],
+            "count": 1,
+            "pops": 2,
+            "heap_size": 2,
+        }
+        assert second.id in {
+            event["user_id"] for event in trace.events if event["event"] == "assign"
+        }
+
+    def test_saved_to_trace_dir(self, staff_users, date_range, settings, tmp_path):
+        settings.PLANNER_TRACE_DIR = str(tmp_path)
+        for d in date_range["dates"]:
+            Duty.objects.create(date=d)
+        trace = PlanTrace(enabled=True)
+
+        ManageAssignments().create_plan(
+            date_range["start"], date_range["end"], 2, seed=0, trace=trace
+        )
+
+        path = tmp_path / f"{trace.trace_id}.jsonl"
+        assert len(path.read_text().splitlines()) == len(trace.events)
+
+    def test_not_saved_untraced(self, staff_users, date_range, settings, tmp_path):
+        settings.PLANNER_TRACE_DIR = str(tmp_path)
+        for d in date_range["dates"]:
+            Duty.objects.create(date=d)
+
+        ManageAssignments().create_plan(date_range["start"], date_range["end"], 2)
+
+        assert list(tmp_path.iterdir()) == []
+
+    def test_no_info_logs_per_decision(self, staff_users, date_range, caplog):
+        planner = make_planner(date_range)
+
+        with caplog.at_level(logging.INFO, logger="planner"):
+            planner.create_plan()
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].name == "planner.services.planner"
+
+    def test_events_are_logged(self, staff_users, date_range, caplog):
+        trace = PlanTrace(enabled=True)
+        planner = make_planner(date_range, trace)
+
+        with caplog.at_level(logging.INFO, logger="planner.trace"):
+            planner.create_plan()
+
+        records = [r for r in caplog.records if r.name == "planner.trace"]
+        assert len(records) == len(trace.events)
+        assert all(trace.trace_id in r.getMessage() for r in records)
+
+
+@pytest.mark.django_db
+class TestGenerateTrace:
+    """Tests for the trace flag of the generate endpoint"""
+
+    def test_trace_flag(self, authenticated_client, staff_users, date_range, caplog):
+        data = {
+            "dates": [d.isoformat() for d in date_range["dates"]],
+            "people_per_day": 1,
+        }
+
+        with caplog.at_level(logging.INFO, logger="planner.trace"):
+            response = authenticated_client.post(
+                "/api/duties/generate/?trace=true", data, format="json"
+            )
+
+        assert response.status_code == 200
+        assert any(r.name == "planner.trace" for r in caplog.records)
+        assert len(response.data["trace_id"]) == 32
+        assert response.data["trace"][0]["event"] == "plan"
+
+    def test_no_trace_by_default(self, authenticated_client, staff_users, date_range):
+        data = {
+            "dates": [d.isoformat() for d in date_range["dates"]],
+            "people_per_day": 1,
+        }
+
+        response = authenticated_client.post(
+            "/api/duties/generate/", data, format="json"
+        )
+
+        assert response.status_code == 200
+        assert "trace" not in response.data
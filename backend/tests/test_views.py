@@ -3,8 +3,10 @@ Tests for ViewSets (API endpoints)
 """
 
 import datetime
+import io
 
 import pytest
+from django.core.cache import cache
 from rest_framework import status
 from planner.models import Staff, DaysOff, Duty, DutyAssignment
 import logging
@@ -85,6 +87,18 @@ class TestStaffViewSet:
                 assert "month" in duty_info
                 assert "duty_count" in duty_info
 
+    def test_list_staff_not_modified(self, api_client, staff_users):
+        """Test staff list answers 304 until staff changes"""
+        etag = api_client.get("/api/users/").headers["ETag"]
+
+        response = api_client.get("/api/users/", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        staff_users[0].first_name = "Changed"
+        staff_users[0].save()
+        response = api_client.get("/api/users/", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+
     def test_stats_action_missing_params(self, api_client):
         """Test stats action without required params returns 400"""
         response = api_client.get("/api/users/stats/")
@@ -102,6 +116,61 @@ class TestStaffViewSet:
         assert response.status_code == status.HTTP_200_OK
         assert response.data == []
 
+    def test_calendar(self, api_client, duty_assignments):
+        """Test personal ICS feed of a staff member"""
+        assignment = duty_assignments[0]
+        response = api_client.get(f"/api/users/{assignment.user_id}/calendar/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"].startswith("text/calendar")
+        assert "ETag" in response and "Last-Modified" in response
+        body = response.content.decode()
+        assert body.count("BEGIN:VEVENT") == 1
+        assert f"UID:assignment-{assignment.id}@duty-planner" in body
+
+    def test_calendar_not_modified(
+        self, api_client, duty_assignments, django_assert_num_queries
+    ):
+        """Test feed revalidation is answered from the cache"""
+        url = f"/api/users/{duty_assignments[0].user_id}/calendar/"
+        etag = api_client.get(url)["ETag"]
+
+        with django_assert_num_queries(0):
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_calendar_etag_survives_cache_clear(self, api_client, duty_assignments):
+        """Test feed ETag follows the data, not the time it was rendered"""
+        url = f"/api/users/{duty_assignments[0].user_id}/calendar/"
+        first = api_client.get(url)
+
+        cache.clear()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == first["ETag"]
+
+    def test_calendar_changes_with_assignments(
+        self, authenticated_client, duty_assignments
+    ):
+        """Test feed ETag changes when the user's assignments change"""
+        assignment = duty_assignments[0]
+        url = f"/api/users/{assignment.user_id}/calendar/"
+        etag = authenticated_client.get(url)["ETag"]
+
+        authenticated_client.delete(f"/api/duties/{assignment.id}/")
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "BEGIN:VEVENT" not in response.content.decode()
+
+    def test_calendar_unknown_user(self, api_client, db):
+        """Test feed of a missing staff member"""
+        response = api_client.get("/api/users/999999/calendar/")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
 
 @pytest.mark.django_db
 class TestDaysOffViewSet:
@@ -164,6 +233,114 @@ class TestDaysOffViewSet:
         assert response.status_code == status.HTTP_204_NO_CONTENT
         assert DaysOff.objects.count() == 0
 
+    def test_import_days_off(self, authenticated_client, staff_users, tomorrow):
+        """Test importing days off of several staff members"""
+        dates = [tomorrow, tomorrow + datetime.timedelta(days=1)]
+        data = {
+            "entries": [
+                {"user": user.id, "dates": [d.isoformat() for d in dates]}
+                for user in staff_users
+            ]
+        }
+        response = authenticated_client.post(
+            "/api/days-off/import/", data, format="json"
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data == {"created": 2 * len(staff_users), "skipped": 0}
+        assert DaysOff.objects.count() == 2 * len(staff_users)
+
+    def test_import_days_off_csv(self, authenticated_client, staff_users, tomorrow):
+        """Test importing days off from a CSV file"""
+        rows = "".join(f"{user.id},{tomorrow.isoformat()}\n" for user in staff_users)
+        upload = io.BytesIO(f"user,date\n{rows}".encode())
+        upload.name = "days_off.csv"
+
+        response = authenticated_client.post(
+            "/api/days-off/import/", {"file": upload}, format="multipart"
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert set(DaysOff.objects.values_list("user_id", flat=True)) == {
+            user.id for user in staff_users
+        }
+
+    def test_import_days_off_csv_missing_columns(self, authenticated_client):
+        """Test CSV without the required columns"""
+        upload = io.BytesIO(b"email,day\na@example.com,2030-01-01\n")
+        upload.name = "days_off.csv"
+
+        response = authenticated_client.post(
+            "/api/days-off/import/", {"file": upload}, format="multipart"
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "user и date" in str(response.data)
+
+    def test_import_days_off_unknown_user(self, authenticated_client, tomorrow):
+        """Test importing days off of a missing staff member"""
+        data = {"entries": [{"user": 999999, "dates": [tomorrow.isoformat()]}]}
+        response = authenticated_client.post(
+            "/api/days-off/import/", data, format="json"
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "999999" in str(response.data)
+        assert DaysOff.objects.count() == 0
+
+    def test_import_days_off_existing(self, authenticated_client, day_off):
+        """Test existing days off are rejected unless skipped"""
+        next_day = day_off.date + datetime.timedelta(days=1)
+        data = {
+            "entries": [
+                {
+                    "user": day_off.user_id,
+                    "dates": [day_off.date.isoformat(), next_day.isoformat()],
+                }
+            ]
+        }
+
+        response = authenticated_client.post(
+            "/api/days-off/import/", data, format="json"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "Уже есть выходные" in str(response.data)
+
+        data["skip_existing"] = True
+        response = authenticated_client.post(
+            "/api/days-off/import/", data, format="json"
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data == {"created": 1, "skipped": 1}
+        assert DaysOff.objects.count() == 2
+
+    def test_import_days_off_duplicates(
+        self, authenticated_client, staff_user, tomorrow
+    ):
+        """Test duplicate pairs in one import"""
+        data = {
+            "entries": [
+                {"user": staff_user.id, "dates": [tomorrow.isoformat()]},
+                {"user": staff_user.id, "dates": [tomorrow.isoformat()]},
+            ]
+        }
+        response = authenticated_client.post(
+            "/api/days-off/import/", data, format="json"
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "повторяющиеся даты" in str(response.data)
+
+    def test_import_days_off_requires_auth(self, api_client, staff_user, tomorrow):
+        """Test import is not available anonymously"""
+        data = {"entries": [{"user": staff_user.id, "dates": [tomorrow.isoformat()]}]}
+        response = api_client.post("/api/days-off/import/", data, format="json")
+
+        assert response.status_code in (
+            status.HTTP_401_UNAUTHORIZED,
+            status.HTTP_403_FORBIDDEN,
+        )
+
 
 @pytest.mark.django_db
 class TestDutyAssignmentViewSet:
@@ -181,6 +358,176 @@ class TestDutyAssignmentViewSet:
         assert "data" in response.data
         assert len(response.data["data"]) > 0
 
+    def test_list_assignments_paginated(self, api_client, duty_days, date_range):
+        """Test list_assignments walks the range page by page with a cursor"""
+        params = {
+            "start_date": date_range["start"].isoformat(),
+            "end_date": date_range["end"].isoformat(),
+            "limit": 3,
+        }
+        dates = []
+        while True:
+            response = api_client.get("/api/duties/list_assignments/", params)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data["data"]) <= 3
+            dates.extend(d["date"] for d in response.data["data"])
+            if response.data["next_cursor"] is None:
+                break
+            params["cursor"] = response.data["next_cursor"]
+
+        assert dates == [d.date.isoformat() for d in duty_days]
+
+    def test_list_assignments_stream(self, api_client, duty_assignments, date_range):
+        """Test list_assignments streams the same payload as the plain mode"""
+        import json
+
+        params = {
+            "start_date": date_range["start"].isoformat(),
+            "end_date": date_range["end"].isoformat(),
+        }
+        plain = api_client.get("/api/duties/list_assignments/", params)
+        streamed = api_client.get(
+            "/api/duties/list_assignments/", {**params, "stream": "true"}
+        )
+
+        assert streamed.status_code == status.HTTP_200_OK
+        assert streamed.streaming
+        body = json.loads(b"".join(streamed.streaming_content))
+        assert sorted(body["data"], key=lambda d: d["date"]) == sorted(
+            json.loads(plain.content)["data"], key=lambda d: d["date"]
+        )
+
+    def test_export_csv(self, api_client, duty_assignments, date_range):
+        """Test CSV export streams one row per assignment"""
+        import csv
+
+        params = {
+            "start_date": date_range["start"].isoformat(),
+            "end_date": date_range["end"].isoformat(),
+        }
+        response = api_client.get("/api/duties/export/csv/", params)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response["Content-Type"].startswith("text/csv")
+        assert "attachment" in response["Content-Disposition"]
+        rows = list(
+            csv.reader(io.StringIO(b"".join(response.streaming_content).decode()))
+        )
+        assert rows[0] == ["date", "user_id", "email", "last_name", "first_name"]
+        assert sorted((row[0], int(row[1])) for row in rows[1:]) == sorted(
+            (a.duty.date.isoformat(), a.user_id) for a in duty_assignments
+        )
+
+    def test_export_ics(self, api_client, duty_assignments, date_range):
+        """Test iCalendar export has one VEVENT per assignment"""
+        params = {
+            "start_date": date_range["start"].isoformat(),
+            "end_date": date_range["end"].isoformat(),
+        }
+        response = api_client.get("/api/duties/export/ics/", params)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response["Content-Type"].startswith("text/calendar")
+        body = b"".join(response.streaming_content).decode()
+        assert body.startswith("BEGIN:VCALENDAR\r\n")
+        assert body.endswith("END:VCALENDAR\r\n")
+        assert body.count("BEGIN:VEVENT") == len(duty_assignments)
+        assignment = duty_assignments[0]
+        assert f"UID:assignment-{assignment.id}@duty-planner" in body
+        assert f"DTSTART;VALUE=DATE:{assignment.duty.date:%Y%m%d}" in body
+        assert all(len(line.encode()) <= 75 for line in body.split("\r\n"))
+
+    def test_export_ics_folds_long_lines(self, api_client, duty_day):
+        """Test long SUMMARY lines are folded without splitting characters"""
+        user = Staff.objects.create(
+            first_name="Констанция",
+            last_name="Длиннофамильная-Иванова, мл.",
+            email="k@example.com",
+        )
+        DutyAssignment.objects.create(user=user, duty=duty_day)
+        params = {
+            "start_date": duty_day.date.isoformat(),
+            "end_date": duty_day.date.isoformat(),
+        }
+
+        response = api_client.get("/api/duties/export/ics/", params)
+
+        body = b"".join(response.streaming_content).decode()
+        assert all(len(line.encode()) <= 75 for line in body.split("\r\n"))
+        assert (
+            "SUMMARY:Дежурство: Констанция Длиннофамильная-Иванова\\, мл."
+            in body.replace("\r\n ", "")
+        )
+
+    def test_export_not_modified(self, api_client, duty_assignments, date_range):
+        """Test export answers 304 for an unchanged range"""
+        params = {
+            "start_date": date_range["start"].isoformat(),
+            "end_date": date_range["end"].isoformat(),
+        }
+        etag = api_client.get("/api/duties/export/ics/", params)["ETag"]
+
+        response = api_client.get(
+            "/api/duties/export/ics/", params, HTTP_IF_NONE_MATCH=etag
+        )
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_export_missing_dates(self, api_client):
+        """Test export requires a date range"""
+        response = api_client.get("/api/duties/export/csv/")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_list_assignments_compact(self, api_client, duty_assignments, date_range):
+        """Test list_assignments compact shape with a top-level staff map"""
+        params = {
+            "start_date": date_range["start"].isoformat(),
+            "end_date": date_range["end"].isoformat(),
+            "compact": "true",
+        }
+        response = api_client.get("/api/duties/list_assignments/", params)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data["staff"]) == {a.user_id for a in duty_assignments}
+        for duty in response.data["data"]:
+            assert all(isinstance(user_id, int) for user_id in duty["users"])
+
+    def test_list_assignments_not_modified(
+        self, authenticated_client, duty_assignment, staff_users, date_range
+    ):
+        """Test list_assignments answers 304 until the schedule changes"""
+        params = {
+            "start_date": date_range["start"].isoformat(),
+            "end_date": date_range["end"].isoformat(),
+        }
+        response = authenticated_client.get("/api/duties/list_assignments/", params)
+        etag = response.headers["ETag"]
+        assert "Last-Modified" in response.headers
+
+        response = authenticated_client.get(
+            "/api/duties/list_assignments/", params, HTTP_IF_NONE_MATCH=etag
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        authenticated_client.post(
+            "/api/duties/assign/",
+            {
+                "user_id_prev": None,
+                "user_id_new": staff_users[1].id,
+                "date": duty_assignment.duty.date.isoformat(),
+            },
+            query_params={"delta": "true"},
+            format="json",
+        )
+        response = authenticated_client.get(
+            "/api/duties/list_assignments/", params, HTTP_IF_NONE_MATCH=etag
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["ETag"] != etag
+
     def test_list_assignments_missing_params(self, api_client):
         """Test list_assignments without required params"""
         response = api_client.get("/api/duties/list_assignments/")
@@ -202,6 +549,27 @@ class TestDutyAssignmentViewSet:
         # Check duties were created
         assert Duty.objects.count() == len(date_range["dates"])
 
+    def test_generate_reports_created_dates(
+        self, authenticated_client, staff_users, duty_day, date_range
+    ):
+        """Test generate reports which duty days it created"""
+        data = {
+            "dates": [d.isoformat() for d in date_range["dates"]],
+            "people_per_day": 1,
+        }
+        response = authenticated_client.post(
+            "/api/duties/generate/", data, format="json"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert duty_day.date not in response.data["created_dates"]
+        assert len(response.data["created_dates"]) == len(date_range["dates"]) - 1
+
+        response = authenticated_client.post(
+            "/api/duties/generate/", data, format="json"
+        )
+        assert response.data["created_dates"] == []
+
     def test_generate_with_insufficient_staff(self, api_client, staff_user, date_range):
         """Test generation with insufficient staff"""
         data = {
@@ -223,6 +591,69 @@ class TestDutyAssignmentViewSet:
 
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
+    def test_generate_replan(self, authenticated_client, staff_users, duty_days):
+        """Test replan mode only refills duties broken by a new day off"""
+        assignment = DutyAssignment.objects.create(
+            user=staff_users[0], duty=duty_days[0]
+        )
+        kept = DutyAssignment.objects.create(user=staff_users[1], duty=duty_days[2])
+        DaysOff.objects.create(user=staff_users[0], date=duty_days[0].date)
+        data = {
+            "dates": [d.date.isoformat() for d in duty_days],
+            "people_per_day": 1,
+            "replan": True,
+        }
+
+        response = authenticated_client.post(
+            "/api/duties/generate/", data, format="json"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert not DutyAssignment.objects.filter(id=assignment.id).exists()
+        assert DutyAssignment.objects.filter(duty=duty_days[0]).count() == 1
+        assert DutyAssignment.objects.filter(id=kept.id).exists()
+        assert not DutyAssignment.objects.filter(duty=duty_days[1]).exists()
+
+    def test_generate_replan_requires_greedy(self, authenticated_client, date_range):
+        """Test replan mode rejects other solvers"""
+        data = {
+            "dates": [d.isoformat() for d in date_range["dates"]],
+            "people_per_day": 1,
+            "replan": True,
+            "solver": "flow",
+        }
+
+        response = authenticated_client.post(
+            "/api/duties/generate/", data, format="json"
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_generate_batch(self, authenticated_client, staff_users, date_range):
+        """Test batch generation plans several ranges in one call"""
+        dates = [d.isoformat() for d in date_range["dates"]]
+        data = {"ranges": [dates[4:], dates[:3]], "people_per_day": 1, "seed": 3}
+
+        response = authenticated_client.post(
+            "/api/duties/generate_batch/", data, format="json"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["seed"] == 3
+        assert response.data["errors"] == {}
+        assert [d["date"] for d in response.data["data"]] == dates[:3] + dates[4:]
+        assert DutyAssignment.objects.count() == len(dates) - 1
+
+    def test_generate_batch_empty_range(self, authenticated_client, date_range):
+        """Test batch generation rejects an empty date set"""
+        data = {"ranges": [[date_range["start"].isoformat()], []], "people_per_day": 1}
+
+        response = authenticated_client.post(
+            "/api/duties/generate_batch/", data, format="json"
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_generate_empty_dates(self, api_client):
         """Test generation with empty dates list"""
         data = {"dates": [], "people_per_day": 2}
@@ -294,6 +725,30 @@ class TestDutyAssignmentViewSet:
         # Check assignment was deleted
         assert not DutyAssignment.objects.filter(id=duty_assignment.id).exists()
 
+    def test_assign_delta(self, authenticated_client, duty_assignment, staff_users):
+        """Test assign in delta mode returns only the changed duty"""
+        duty = duty_assignment.duty
+        version = duty.updated_at
+        new_user = staff_users[1]
+        data = {
+            "user_id_prev": duty_assignment.user.id,
+            "user_id_new": new_user.id,
+            "date": duty.date.isoformat(),
+        }
+        response = authenticated_client.post(
+            "/api/duties/assign/", data, query_params={"delta": "true"}, format="json"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["duty"]["id"] == duty.id
+        assert [u["id"] for u in response.data["duty"]["users"]] == [new_user.id]
+        priorities = {s["id"]: s["priority"] for s in response.data["staff"]}
+        assert priorities == {
+            duty_assignment.user.id: 0,
+            new_user.id: new_user.priority + 1,
+        }
+        assert response.data["version"] > version
+
     def test_assign_missing_query_params(self, api_client, staff_user, duty_day):
         """Test assign without required query params"""
         data = {
@@ -359,6 +814,34 @@ class TestDutyViewSet:
         # No duties deleted, count is None since queryset returned empty dict
         assert response.data["deleted_duty_count"] is None
 
+    def test_bulk_delete_duties_range(
+        self, authenticated_client, duty_assignments, date_range
+    ):
+        """Test bulk delete by date range reports per-model counts"""
+        data = {
+            "start_date": date_range["start"].isoformat(),
+            "end_date": date_range["end"].isoformat(),
+        }
+        response = authenticated_client.post(
+            "/api/duties/bulk_delete/", data, format="json"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["deleted_duty_count"] == len(date_range["dates"])
+        assert response.data["deleted"] == {
+            "planner.DutyAssignment": len(duty_assignments),
+            "planner.Duty": len(date_range["dates"]),
+        }
+        assert Duty.objects.count() == 0
+
+    def test_bulk_delete_duties_requires_mode(self, authenticated_client):
+        """Test bulk delete without ids or range"""
+        response = authenticated_client.post(
+            "/api/duties/bulk_delete/", {}, format="json"
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_bulk_delete_duties_nonexistent_ids(self, api_client):
         """Test bulk delete with non-existent duty ids — returns 200 with count 0 or None"""
         response = api_client.post(
@@ -0,0 +1,13 @@
+#!/bin/sh
+
+set -e
+
+# The backend container applies migrations and creates the cache table;
+# wait for both instead of running them concurrently.
+until python manage.py migrate --check >/dev/null 2>&1 \
+    && [ -z "$(python manage.py createcachetable --dry-run 2>&1)" ]; do
+    echo "Waiting for the backend to prepare the database..."
+    sleep 2
+done
+
+exec "$@"